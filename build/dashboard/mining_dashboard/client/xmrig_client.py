@@ -1,4 +1,6 @@
 import logging
+from types import MappingProxyType
+import aiohttp
 from config.config import XMRIG_API_PORT, API_TIMEOUT
 
 class XMRigWorkerClient:
@@ -9,6 +11,18 @@ class XMRigWorkerClient:
         """
         self.session = session
         self.logger = logging.getLogger("WorkerClient")
+        # Read-only Authorization headers per worker token, built once and reused every poll
+        self._headers = {}
+        # Per-attempt budget: an unresponsive rig fails fast instead of holding up the tick
+        self._timeout = aiohttp.ClientTimeout(total=API_TIMEOUT, connect=API_TIMEOUT)
+
+    def _get_headers(self, token):
+        """Returns the cached Authorization header mapping for a worker token."""
+        headers = self._headers.get(token)
+        if headers is None:
+            headers = MappingProxyType({"Authorization": f"Bearer {token}"})
+            self._headers[token] = headers
+        return headers
 
     async def get_stats(self, ip, name):
         """
@@ -16,7 +30,7 @@ class XMRigWorkerClient:
         """
         # Derive auth token from worker name (e.g., "hostname+diff" -> "hostname")
         token = name.split('+')[0].strip()
-        headers = {"Authorization": f"Bearer {token}"}
+        headers = self._get_headers(token)
         
         # Try connecting via IP, then Hostname, then Hostname.local
         targets = []
@@ -29,7 +43,7 @@ class XMRigWorkerClient:
         for target in targets:
             url = f"http://{target}:{XMRIG_API_PORT}/1/summary"
             try:
-                async with self.session.get(url, headers=headers, timeout=API_TIMEOUT) as response:
+                async with self.session.get(url, headers=headers, timeout=self._timeout) as response:
                     if response.status == 200:
                         return await response.json()
             except Exception as e:
@@ -1,8 +1,13 @@
-import requests
+import asyncio
 import json
 import logging
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+import aiohttp
+from helper.utils import loads_json
+
+# Transient statuses retried with exponential backoff
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+RETRY_TOTAL = 3
+RETRY_BACKOFF_FACTOR = 1 # Wait 1s, 2s, 4s between retries
 
 class XMRigProxyClient:
     def __init__(self, host="127.0.0.1", port=8080, access_token=None):
@@ -15,22 +20,51 @@ class XMRigProxyClient:
         """
         self.logger = logging.getLogger("ProxyClient")
         self.base_url = f"http://{host}:{port}"
-        
-        # Configure Session with Retries
-        self.session = requests.Session()
-        retry_strategy = Retry(
-            total=3,
-            backoff_factor=1, # Wait 1s, 2s, 4s between retries
-            status_forcelist=[429, 500, 502, 503, 504],
-            allowed_methods=["HEAD", "GET", "PUT", "OPTIONS"]
-        )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        self.session.mount("http://", adapter)
-        
+        self.timeout = aiohttp.ClientTimeout(total=5)
+
+        self.headers = {}
         if access_token:
-            self.session.headers.update({"Authorization": f"Bearer {access_token}"})
+            self.headers["Authorization"] = f"Bearer {access_token}"
 
-    def get_summary(self):
+        # Created lazily inside the running event loop
+        self.session = None
+
+    def _get_session(self):
+        """Returns the client session, creating it on first use."""
+        if self.session is None or self.session.closed:
+            # Polled every collection tick: keep the connection open between ticks
+            connector = aiohttp.TCPConnector(limit_per_host=4, keepalive_timeout=60, ttl_dns_cache=300)
+            self.session = aiohttp.ClientSession(connector=connector, headers=self.headers, timeout=self.timeout)
+        return self.session
+
+    async def _request(self, method, path, **kwargs):
+        """
+        Performs an API request with retries on connection errors and transient statuses.
+
+        :return: The raw response body as bytes.
+        """
+        url = f"{self.base_url}{path}"
+        for attempt in range(RETRY_TOTAL + 1):
+            try:
+                async with self._get_session().request(method, url, **kwargs) as response:
+                    if response.status in RETRY_STATUSES and attempt < RETRY_TOTAL:
+                        self.logger.debug(f"Retrying {method} {path} (Status {response.status})")
+                    else:
+                        response.raise_for_status()
+                        return await response.read()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt >= RETRY_TOTAL:
+                    raise
+            await asyncio.sleep(RETRY_BACKOFF_FACTOR * (2 ** attempt))
+
+    async def _request_json(self, method, path, **kwargs):
+        """Performs an API request and decodes the JSON body (empty bodies yield {})."""
+        body = await self._request(method, path, **kwargs)
+        if not body:
+            return {}
+        return loads_json(body)
+
+    async def get_summary(self):
         """
         Get proxy summary information including uptime, version, and resources.
         Endpoint: GET /1/summary
@@ -62,12 +96,9 @@ class XMRigProxyClient:
             }
         }
         """
-        url = f"{self.base_url}/1/summary"
-        response = self.session.get(url, timeout=5)
-        response.raise_for_status()
-        return response.json()
+        return await self._request_json("GET", "/1/summary")
 
-    def get_workers(self):
+    async def get_workers(self):
         """
         Get details about connected workers.
         Endpoint: GET /1/workers
@@ -97,12 +128,9 @@ class XMRigProxyClient:
             ]
         }
         """
-        url = f"{self.base_url}/1/workers"
-        response = self.session.get(url, timeout=5)
-        response.raise_for_status()
-        return response.json()
+        return await self._request_json("GET", "/1/workers")
 
-    def get_config(self):
+    async def get_config(self):
         """
         Get the current configuration of the proxy.
         Endpoint: GET /1/config
@@ -132,12 +160,18 @@ class XMRigProxyClient:
             "log-file": "str"
         }
         """
-        url = f"{self.base_url}/1/config"
-        response = self.session.get(url, timeout=5)
-        response.raise_for_status()
-        return response.json()
+        return await self._request_json("GET", "/1/config")
+
+    async def get_config_raw(self):
+        """
+        Get the current configuration of the proxy as undecoded JSON bytes.
+        Endpoint: GET /1/config
+
+        Allows callers to patch the payload in place without building a Python dict.
+        """
+        return await self._request("GET", "/1/config")
 
-    def update_config(self, config_data):
+    async def update_config(self, config_data):
         """
         Update the proxy configuration.
         Endpoint: PUT /1/config
@@ -157,15 +191,25 @@ class XMRigProxyClient:
             ... (Any other config fields to update)
         }
         """
-        url = f"{self.base_url}/1/config"
-        response = self.session.put(url, json=config_data, timeout=5)
-        response.raise_for_status()
-        # Handle 204 No Content or empty responses which cause JSON decode errors
-        if response.status_code == 204 or not response.content:
-            return {}
-        return response.json()
+        # Empty bodies (e.g. 204 No Content) are returned as {} to avoid JSON decode errors
+        return await self._request_json("PUT", "/1/config", json=config_data)
 
-if __name__ == "__main__":
+    async def update_config_raw(self, body):
+        """
+        Update the proxy configuration from pre-encoded JSON bytes.
+        Endpoint: PUT /1/config
+
+        :param body: The complete configuration as UTF-8 encoded JSON.
+        """
+        await self._request("PUT", "/1/config", data=body, headers={"Content-Type": "application/json"})
+
+    async def close(self):
+        """Closes the underlying HTTP session."""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+async def _main():
     # Configuration
     # Ensure xmrig-proxy is running with API enabled:
     # ./xmrig-proxy --http-port=8080 --http-access-token=SECRET
@@ -179,25 +223,30 @@ if __name__ == "__main__":
     try:
         # 1. Get Summary
         print("--- Summary ---")
-        summary = client.get_summary()
+        summary = await client.get_summary()
         print(json.dumps(summary, indent=4))
 
         # 2. Get Workers
         print("\n--- Worker Details ---")
-        workers = client.get_workers()
+        workers = await client.get_workers()
         print(json.dumps(workers, indent=4))
 
         # 3. Get Config
         print("\n--- Current Config ---")
-        config = client.get_config()
+        config = await client.get_config()
         print(json.dumps(config, indent=4))
 
         # 4. Update Config (Example: changing donate level)
         # print("\n--- Updating Config ---")
-        # updated_config = client.update_config({"donate-level": 1})
+        # updated_config = await client.update_config({"donate-level": 1})
         # print(json.dumps(updated_config, indent=4))
 
-    except requests.exceptions.RequestException as e:
+    except aiohttp.ClientError as e:
         print(f"HTTP Request failed: {e}")
     except Exception as e:
-        print(f"An error occurred: {e}")
\ No newline at end of file
+        print(f"An error occurred: {e}")
+    finally:
+        await client.close()
+
+if __name__ == "__main__":
+    asyncio.run(_main())
\ No newline at end of file
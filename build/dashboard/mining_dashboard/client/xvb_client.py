@@ -1,6 +1,7 @@
-import requests
+import asyncio
 import logging
 import re
+import aiohttp
 from helper.utils import parse_hashrate
 
 class XvbClient:
@@ -13,13 +14,30 @@ class XvbClient:
         self.logger = logging.getLogger("XvbClient")
         self.wallet_address = wallet_address
         self.url = "https://xmrvsbeast.com/cgi-bin/p2pool_bonus_history.cgi"
+        self.timeout = aiohttp.ClientTimeout(total=10)
+
+        # Created lazily inside the running event loop
+        self.session = None
         
         # Pre-compile regex patterns
         self.REGEX_FAIL_COUNT = re.compile(r"Fail Count:\s*(\d+)", re.IGNORECASE)
         self.REGEX_HR_1H = re.compile(r"1hr avg:\s*([\d\.]+)\s*([kKmMgG]?H/s)?", re.IGNORECASE)
         self.REGEX_HR_24H = re.compile(r"24hr avg:\s*([\d\.]+)\s*([kKmMgG]?H/s)?", re.IGNORECASE)
 
-    def get_stats(self):
+    def _get_session(self):
+        """Returns the client session, creating it on first use."""
+        if self.session is None or self.session.closed:
+            # Single remote host: cache its DNS lookup and let stale TLS transports be reaped
+            connector = aiohttp.TCPConnector(limit_per_host=2, ttl_dns_cache=300, enable_cleanup_closed=True)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self.session
+
+    async def close(self):
+        """Closes the underlying HTTP session."""
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+
+    async def get_stats(self):
         """
         Retrieves bonus history statistics from the XMRvsBeast service.
         
@@ -34,13 +52,13 @@ class XvbClient:
         params = {"address": self.wallet_address}
 
         try:
-            response = requests.get(self.url, params=params, timeout=10)
-            if response.status_code == 200:
-                return self._parse_html(response.text)
-            else:
-                self.logger.error(f"XvB API request failed with status code: {response.status_code}")
-                return None
-        except requests.RequestException as e:
+            async with self._get_session().get(self.url, params=params) as response:
+                if response.status == 200:
+                    return self._parse_html(await response.text())
+                else:
+                    self.logger.error(f"XvB API request failed with status code: {response.status}")
+                    return None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             self.logger.error(f"Network error while fetching XvB stats: {e}")
             return None
         except Exception as e:
@@ -1,5 +1,4 @@
 import json
-import os
 import time
 from config.config import (
     P2P_STATS_PATH, POOL_STATS_PATH, NETWORK_STATS_PATH, 
@@ -7,21 +6,20 @@ from config.config import (
     BLOCK_PPLNS_WINDOW_MAIN, BLOCK_PPLNS_WINDOW_MINI, BLOCK_PPLNS_WINDOW_NANO,
     SECOND_PER_BLOCK_P2POOL_MAIN, SECOND_PER_BLOCK_P2POOL_MINI, SECOND_PER_BLOCK_P2POOL_NANO
 )
+from helper.utils import loads_json
 
 def _read_json(path):
     """
     Safely loads a JSON file, returning an empty dictionary on failure.
     Designed to prevent application crashes during transient file I/O operations.
     """
-    if os.path.exists(path):
-        try:
-            with open(path, 'r') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, OSError):
-            # Fail silently to allow the dashboard to continue running
-            # even if a stats file is currently being written to.
-            pass
-    return {}
+    try:
+        with open(path, 'rb') as f:
+            return loads_json(f.read())
+    except (json.JSONDecodeError, OSError):
+        # Fail silently (missing files raise FileNotFoundError, an OSError) to allow the
+        # dashboard to continue running even if a stats file is currently being written to.
+        return {}
 
 def detect_pool_type(peers):
     """
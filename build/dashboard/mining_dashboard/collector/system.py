@@ -1,11 +1,13 @@
 import shutil
 import os
-from config.config import DISK_PATH
+from config.config import DISK_PATH, SLOW_METRICS_TTL
+from helper.utils import ttl_cache
 
 BYTES_IN_GB = 1024 ** 3
 
 _last_cpu_times = None
 
+@ttl_cache(SLOW_METRICS_TTL)
 def get_disk_usage():
     """
     Calculates storage utilization for the configured data directory.
@@ -101,6 +103,7 @@ def get_cpu_usage():
     except Exception:
         return "0.0%"
 
+@ttl_cache(SLOW_METRICS_TTL)
 def get_hugepages_status():
     """
     Analyzes system memory configuration to determine HugePage availability.
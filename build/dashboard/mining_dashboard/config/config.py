@@ -24,7 +24,15 @@ HOST_IP = os.environ.get("HOST_IP", "Unknown Host")
 # XMRig Worker API Configuration
 XMRIG_API_PORT = 8080
 API_TIMEOUT = 1         # Connection timeout (seconds) for worker API calls
+WORKER_CONCURRENCY = int(os.environ.get("WORKER_CONCURRENCY", "16"))  # Max concurrent worker API calls per tick
 UPDATE_INTERVAL = 30    # Frequency (seconds) of the main data aggregation loop
+WORKER_FANOUT_TIMEOUT = UPDATE_INTERVAL * 0.8  # Upper bound (seconds) for one tick's worker API fan-out
+XVB_SYNC_INTERVAL = 300 # Frequency (seconds) of the external XvB statistics sync
+XVB_SYNC_TIMEOUT = 15   # Upper bound (seconds) for a single XvB sync (client request timeout is 10s)
+SNAPSHOT_EVERY_TICKS = 10 # Persist the state snapshot at most every N collection ticks (~5 min); also saved on shutdown
+SNAPSHOT_FORCE_TICKS = 60 # Persist the state snapshot at least every N collection ticks, even if unchanged
+HASHRATE_EWMA_ALPHA = 0.2 # Smoothing factor for the aggregate hashrate recorded in history (1 = no smoothing)
+SLOW_METRICS_TTL = 60   # Cache lifetime (seconds) for slow-changing system metrics (disk, hugepages)
 
 # --- XvB Algorithm Constants ---
 # Duration of the donation switching cycle (10 minutes)
@@ -33,6 +41,9 @@ XVB_TIME_ALGO_MS = 600000
 # Minimum dwell time on a pool to ensure valid share submission (15 seconds)
 XVB_MIN_TIME_SEND_MS = 15000    
 
+# Consecutive XvB endpoint failures before the algorithm falls back to P2Pool
+XVB_FAIL_THRESHOLD = 3
+
 # Wallet address used for fetching XvB bonus history and pool identification
 MONERO_WALLET_ADDRESS = os.environ.get("MONERO_WALLET_ADDRESS", "") 
 
@@ -71,6 +82,10 @@ XVB_SWITCH_OVERHEAD_MS = 5000
 # --- Data Retention Policies ---
 HISTORY_RETENTION_SEC = 30 * 24 * 3600  # 30 Days
 WORKER_RETENTION_SEC = 7 * 24 * 3600    # 7 Days
+HISTORY_FLUSH_BATCH = 10                # History rows buffered per DB transaction (~5 min at UPDATE_INTERVAL)
+HISTORY_FLUSH_INTERVAL = 120            # Max seconds buffered history rows may wait before a flush
+RETENTION_PRUNE_EVERY = 60              # Run the retention DELETE once per N history rows / worker updates
+RETENTION_PRUNE_LIMIT = 5000            # Max history rows removed per retention DELETE (a backlog drains over later prunes)
 
 # --- Donation Tier Configuration ---
 # Hashrate thresholds (H/s) for XMRvsBeast donation tiers.
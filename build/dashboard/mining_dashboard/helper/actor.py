@@ -0,0 +1,58 @@
+import asyncio
+import queue
+import threading
+
+class BlockingClientActor:
+    """
+    Runs blocking calls on a single long-lived OS thread fed by a command queue.
+
+    Calls are executed strictly in submission order, which also serializes access
+    to clients that are not thread-safe (e.g. SQLite writers) without extra locking.
+    """
+    def __init__(self, name):
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        """Command loop: executes queued calls and resolves their futures on the owning loop."""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            loop, fut, fn, args, kwargs = item
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                loop.call_soon_threadsafe(_resolve, fut, None, e)
+            else:
+                loop.call_soon_threadsafe(_resolve, fut, result, None)
+
+    async def call(self, fn, *args, **kwargs):
+        """
+        Submits `fn(*args, **kwargs)` to the actor thread and awaits its result.
+
+        Args:
+            fn (callable): Blocking function to execute.
+
+        Returns:
+            Any: The return value of `fn`; exceptions are re-raised in the caller.
+        """
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._queue.put((loop, fut, fn, args, kwargs))
+        return await fut
+
+    def close(self, timeout=5):
+        """Stops the actor after draining already queued calls."""
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+def _resolve(fut, result, exc):
+    """Completes `fut` unless the awaiting caller has already been cancelled."""
+    if fut.done():
+        return
+    if exc is not None:
+        fut.set_exception(exc)
+    else:
+        fut.set_result(result)
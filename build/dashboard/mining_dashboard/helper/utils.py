@@ -1,6 +1,64 @@
+import bisect
+import functools
+import json
 import time
 from config.config import TIER_DEFAULTS
 
+try:
+    import orjson
+except ImportError:  # Optional C encoder; the stdlib encoder is used when it is unavailable
+    orjson = None
+
+def dumps_json(obj, sort_keys=False):
+    """
+    Serializes an object to UTF-8 encoded JSON, using orjson when installed.
+
+    Args:
+        obj (Any): The object to serialize. Unsupported types are encoded via str().
+        sort_keys (bool): Emit object keys in sorted order (for stable hashing).
+
+    Returns:
+        bytes: The encoded JSON document.
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(obj, default=str, option=option)
+    return json.dumps(obj, sort_keys=sort_keys, default=str).encode("utf-8")
+
+def loads_json(data):
+    """
+    Deserializes a JSON document (str or bytes), using orjson when installed.
+
+    Raises:
+        json.JSONDecodeError: If the document is not valid JSON (orjson's error subclasses it).
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def ttl_cache(ttl):
+    """
+    Caches the result of a zero-argument function for `ttl` seconds.
+
+    Args:
+        ttl (float): Cache lifetime in seconds (monotonic clock).
+
+    Returns:
+        callable: Decorator producing the caching wrapper.
+    """
+    def decorator(fn):
+        entry = [float("-inf"), None]  # [deadline, value]
+
+        @functools.wraps(fn)
+        def wrapper():
+            now = time.monotonic()
+            if now >= entry[0]:
+                entry[1] = fn()
+                entry[0] = now + ttl
+            return entry[1]
+        return wrapper
+    return decorator
+
 def parse_hashrate(val_str, unit_str=None):
     """
     Converts a numeric string and an optional unit suffix into raw hashes per second (H/s).
@@ -99,10 +157,15 @@ def format_time_abs(timestamp):
         return "Never"
         
     try:
-        return time.strftime('%H:%M:%S', time.localtime(timestamp))
-    except (ValueError, OSError):
+        return _format_clock(int(timestamp))
+    except (ValueError, OSError, OverflowError):
         return "Invalid Time"
 
+@functools.lru_cache(maxsize=256)
+def _format_clock(seconds):
+    """Formats whole Unix seconds as local HH:MM:SS (cached; share/block/update times repeat across renders)."""
+    return time.strftime('%H:%M:%S', time.localtime(seconds))
+
 def get_tier_info(hashrate, tiers=None):
     """
     Determines the donation tier based on hashrate.
@@ -111,13 +174,37 @@ def get_tier_info(hashrate, tiers=None):
     if tiers is None:
         tiers = TIER_DEFAULTS
 
-    # Sort tiers by threshold descending to find the highest matching tier first
-    sorted_tiers = sorted(tiers.items(), key=lambda x: x[1], reverse=True)
+    thresholds, results = _build_tier_table(tuple(tiers.items()))
+
+    # Highest threshold <= hashrate via binary search
+    idx = bisect.bisect_right(thresholds, hashrate)
+    if idx:
+        return results[idx - 1]
+
+    return "None", 0.0
+
+@functools.lru_cache(maxsize=16)
+def _build_tier_table(tier_items):
+    """
+    Precomputes the ascending threshold list and display results for a tiers mapping.
+
+    Args:
+        tier_items (tuple): The tiers as (key, threshold) pairs.
+
+    Returns:
+        tuple: (Ascending thresholds, matching (tier_name, tier_threshold) results)
+    """
+    # Ascending by threshold; among equal thresholds the first-defined tier sorts last so it wins
+    ordered = sorted(
+        ((threshold, -i, key) for i, (key, threshold) in enumerate(tier_items) if threshold > 0)
+    )
 
-    for key, threshold in sorted_tiers:
-        if threshold > 0 and hashrate >= threshold:
-            # Format key for display (e.g., "donor_mega" -> "Mega")
-            display_name = key.replace("donor_", "").replace("_", " ").title()
-            return f"{display_name} ({format_hashrate(threshold)}+)", float(threshold)
+    thresholds = []
+    results = []
+    for threshold, _, key in ordered:
+        # Format key for display (e.g., "donor_mega" -> "Mega")
+        display_name = key.replace("donor_", "").replace("_", " ").title()
+        thresholds.append(threshold)
+        results.append((f"{display_name} ({format_hashrate(threshold)}+)", float(threshold)))
 
-    return "None", 0.0
\ No newline at end of file
+    return thresholds, results
\ No newline at end of file
@@ -1,5 +1,6 @@
 import asyncio
 import logging
+import uvloop
 from aiohttp import web
 
 from config.config import PROXY_AUTH_TOKEN, PROXY_HOST, PROXY_API_PORT, MONERO_WALLET_ADDRESS
@@ -28,19 +29,29 @@ algo_service = AlgoService(state_manager, proxy_client, data_service)
 
 async def start_background_tasks(app):
     """Initializes background services upon web application startup."""
+    await data_service.start()
     app['data_task'] = asyncio.create_task(data_service.run())
+    app['xvb_task'] = asyncio.create_task(data_service.run_xvb_sync())
     app['algo_task'] = asyncio.create_task(algo_service.run())
 
 async def cleanup_background_tasks(app):
     """Stops background tasks and closes resources on shutdown."""
     app['data_task'].cancel()
+    app['xvb_task'].cancel()
     app['algo_task'].cancel()
-    await asyncio.gather(app['data_task'], app['algo_task'], return_exceptions=True)
+    await asyncio.gather(app['data_task'], app['xvb_task'], app['algo_task'], return_exceptions=True)
+    await proxy_client.close()
+    await xvb_client.close()
+    await data_service.stop()
+    data_service.close()
     if 'state_manager' in app:
         app['state_manager'].close()
 
 if __name__ == "__main__":
-    app = create_app(state_manager, data_service.latest_data)
+    # libuv-backed event loop for faster scheduling and HTTP fan-out (must precede run_app)
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+    app = create_app(state_manager, data_service)
     app['state_manager'] = state_manager
     app.on_startup.append(start_background_tasks)
     app.on_cleanup.append(cleanup_background_tasks)
@@ -1,7 +1,8 @@
 import asyncio
+import json
 import logging
-import time
 import math
+import re
 from config.config import (
     XVB_TIME_ALGO_MS, 
     MONERO_WALLET_ADDRESS, 
@@ -11,12 +12,21 @@ from config.config import (
     XVB_MIN_TIME_SEND_MS,
     ENABLE_XVB,
     ALGO_TARGET_BUFFER,
-    XVB_SWITCH_OVERHEAD_MS
+    XVB_SWITCH_OVERHEAD_MS,
+    XVB_FAIL_THRESHOLD
 )
 from helper.utils import get_tier_info
 
 logger = logging.getLogger("AlgoService")
 
+# Width (H/s) of the capacity buckets used for tier selection (and the decision cache key)
+TIER_BUCKET_HR = 100
+
+# Locates the value of the `pools` key in raw proxy config JSON
+POOLS_KEY_PATTERN = re.compile(rb'"pools"\s*:\s*')
+
+_json_decoder = json.JSONDecoder()
+
 class AlgoService:
     def __init__(self, state_manager, proxy_client, data_service):
         self.state_manager = state_manager
@@ -25,51 +35,116 @@ class AlgoService:
         # Safety margin (15%) to ensure the 1h average strictly meets the tier requirement
         self.target_buffer = ALGO_TARGET_BUFFER
 
-    async def switch_miners(self, mode, state_label=None):
-        """
-        Configures the upstream pool priority for the XMRig Proxy.
-        """
-        if mode == "P2POOL":
-            pools = [
+        # Last decision inputs/outcome, used to skip re-evaluation when nothing changed
+        self._last_decision_key = None
+        self._last_decision = None
+
+        # Mode whose pool layout was last applied to the proxy (None = unknown, push on next switch)
+        self._applied_mode = None
+
+        # Upstream pool layouts (active pool first) and their JSON encoding, built once;
+        # every switch reuses them instead of allocating fresh lists of dicts.
+        self._pool_layouts = {
+            "P2POOL": (
                 {"url": P2POOL_URL, "user": MONERO_WALLET_ADDRESS, "pass": "x", "enabled": True, "coin": "monero"},
                 {"url": XVB_POOL_URL, "user": XVB_DONOR_ID, "pass": "x", "enabled": False, "coin": "monero"}
-            ]
-        else:
-            pools = [
+            ),
+            "XVB": (
                 {"url": XVB_POOL_URL, "user": XVB_DONOR_ID, "pass": "x", "enabled": True, "coin": "monero"},
                 {"url": P2POOL_URL, "user": MONERO_WALLET_ADDRESS, "pass": "x", "enabled": False, "coin": "monero"}
-            ]
+            )
+        }
+        self._pool_layouts_json = {m: json.dumps(list(pools)) for m, pools in self._pool_layouts.items()}
+
+    def _build_pools(self, mode):
+        """Returns a fresh upstream pool list with the active pool first (the dicts are shared, do not mutate)."""
+        return list(self._pool_layouts["P2POOL" if mode == "P2POOL" else "XVB"])
+
+    def _splice_pools(self, raw_config, mode):
+        """
+        Replaces only the `pools` array in the raw config bytes, leaving every other key untouched.
+
+        Only the pools array is decoded (to find where it ends); the rest of the config is
+        copied through as-is.
+
+        Returns:
+            bytes or None: The spliced config, or None if no `pools` array could be located.
+        """
+        if not raw_config or not raw_config.lstrip().startswith(b"{"):
+            return None
+
+        match = POOLS_KEY_PATTERN.search(raw_config)
+        if not match:
+            return None
+
+        try:
+            text = raw_config.decode("utf-8")
+            # Offsets are computed on the decoded text to stay correct with multi-byte characters
+            start = len(raw_config[:match.end()].decode("utf-8"))
+            existing, end = _json_decoder.raw_decode(text, start)
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            return None
+
+        if not isinstance(existing, list):
+            return None
+
+        pools_json = self._pool_layouts_json["P2POOL" if mode == "P2POOL" else "XVB"]
+        return (text[:start] + pools_json + text[end:]).encode("utf-8")
+
+    async def switch_miners(self, mode, state_label=None):
+        """
+        Configures the upstream pool priority for the XMRig Proxy.
+        """
+        final_label = state_label if state_label else mode
+
+        # Short-circuit: the pool layout depends only on the mode, so re-applying the
+        # active mode is a no-op for the proxy; only the (local) state label may change.
+        if mode == self._applied_mode:
+            await self.data_service.db_actor.call(self.state_manager.transition, final_label)
+            return
 
         try:
-            # Fetch current full configuration to preserve other settings
-            current_config = await asyncio.to_thread(self.proxy_client.get_config)
-            if not current_config or not isinstance(current_config, dict):
-                logger.error("Failed to fetch valid proxy config, aborting switch.")
-                return
+            # Fetch the live config on every switch so settings changed outside the
+            # dashboard (operator edits, a regenerated config) are preserved.
+            raw_config = await self.proxy_client.get_config_raw()
+
+            # Splice the full pools array (active pool first, configured wallet/donor ID) into
+            # the raw config without decoding the rest
+            patched_config = self._splice_pools(raw_config, mode)
+
+            if patched_config is not None:
+                await self.proxy_client.update_config_raw(patched_config)
+            else:
+                current_config = json.loads(raw_config) if raw_config else None
+                if not current_config or not isinstance(current_config, dict):
+                    logger.error("Failed to fetch valid proxy config, aborting switch.")
+                    return
 
-            current_config["pools"] = pools
+                current_config["pools"] = self._build_pools(mode)
 
-            # Execute update via Proxy Client with the full configuration
-            await asyncio.to_thread(self.proxy_client.update_config, current_config)
+                # Execute update via Proxy Client with the full configuration
+                await self.proxy_client.update_config(current_config)
             
-            # Update state manager with the new active mode
-            final_label = state_label if state_label else mode
-            await asyncio.to_thread(self.state_manager.update_xvb_stats, mode=final_label)
+            self._applied_mode = mode
+
+            # Record the new active mode in a single state transition
+            await self.data_service.db_actor.call(self.state_manager.transition, final_label)
             logger.info(f"Switched Proxy to mode: {mode} (Label: {final_label})")
         except Exception as e:
+            # Proxy state is unknown after a failed switch: push the layout again next time
+            self._applied_mode = None
             logger.error(f"Failed to switch proxy mode: {e}")
 
-    def get_decision(self, current_hr, stable_hr, p2pool_stats, p2p_stats, xvb_stats, shares):
+    def get_decision(self, current_hr, stable_hr, window_duration, shares_in_window_count, xvb_stats):
         """
         Evaluates the current mining state to determine the next operation mode.
 
         Args:
             current_hr (float): Current real-time (10s) hashrate for calculation.
             stable_hr (float): Stable (15m) hashrate for tier selection.
-            p2pool_stats (dict): Statistics from the local P2Pool node.
-            p2p_stats (dict): P2P network statistics (for pool type detection).
+            window_duration (int): Length of the PPLNS window in seconds.
+            shares_in_window_count (int): Shares found within the PPLNS window.
             xvb_stats (dict): Historical statistics for XvB mining.
-            shares (list): List of recent shares with timestamps.
 
         Returns:
             tuple: (Mode String ["P2POOL"|"XVB"|"SPLIT"], Duration in ms)
@@ -78,26 +153,38 @@ class AlgoService:
         if not ENABLE_XVB:
             return "P2POOL", 0
 
-        # Constraint: Enforce P2Pool mode if no shares have been found recently.
-        # This uses the same logic as the dashboard UI to count shares within the PPLNS window.
-        pool_type = p2p_stats.get('type', 'Main')
-        pplns_window = p2pool_stats.get('pplns_window', 2160)
-        
-        block_time = 10  # Default for Main/Mini
-        if pool_type == "Nano":
-            block_time = 30
+        fail_count = xvb_stats.get('fail_count', 0)
+        avg_24h = xvb_stats.get('avg_24h', 0)
+        avg_1h = xvb_stats.get('avg_1h', 0)
+
+        # Short-circuit: reuse the previous outcome when the inputs are unchanged.
+        # The real-time hashrate is compared at 100 H/s resolution, tier capacity per bucket.
+        decision_key = (
+            shares_in_window_count > 0,
+            fail_count,
+            avg_24h,
+            avg_1h,
+            round(current_hr, -2),
+            int(stable_hr * 0.85 / TIER_BUCKET_HR)
+        )
+        if decision_key == self._last_decision_key:
+            return self._last_decision
 
-        window_duration = pplns_window * block_time
-        cutoff = time.time() - window_duration
-        shares_in_window_count = sum(1 for s in shares if s.get('ts', 0) >= cutoff)
+        decision = self._evaluate_decision(
+            current_hr, stable_hr, window_duration, shares_in_window_count, fail_count, avg_24h, avg_1h
+        )
+        self._last_decision_key = decision_key
+        self._last_decision = decision
+        return decision
 
+    def _evaluate_decision(self, current_hr, stable_hr, window_duration, shares_in_window_count, fail_count, avg_24h, avg_1h):
+        """Applies the decision rules to the pre-extracted inputs of `get_decision`."""
         if shares_in_window_count == 0:
             logger.info(f"Decision Strategy: Force P2POOL (Zero shares in PPLNS window of {window_duration}s)")
             return "P2POOL", 0
 
         # Constraint: Fallback to P2Pool if XvB endpoint failures exceed threshold.
-        fail_count = xvb_stats.get('fail_count', 0)
-        if fail_count >= 3:
+        if fail_count >= XVB_FAIL_THRESHOLD:
             logger.warning(f"Decision Strategy: Force P2POOL (Excessive XvB failures: {fail_count})")
             return "P2POOL", 0
 
@@ -111,9 +198,6 @@ class AlgoService:
 
         # Verify if donation targets are currently satisfied
         # Criteria: 24h Avg >= Target AND 1h Avg >= (Target - Margin)
-        avg_24h = xvb_stats.get('avg_24h', 0)
-        avg_1h = xvb_stats.get('avg_1h', 0)
-
         is_fulfilled = (avg_24h >= target_hr) and (avg_1h >= target_hr)
 
         if not is_fulfilled:
@@ -149,28 +233,44 @@ class AlgoService:
         
         Reserves a 15% safety margin on the current hashrate to ensure
         P2Pool stability before committing to a higher tier.
+        The capacity is floored to TIER_BUCKET_HR buckets, matching the decision cache key.
         """
-        safe_capacity = current_hr * 0.85 
-        tiers = self.state_manager.get_tiers()
-        
-        _, threshold = get_tier_info(safe_capacity, tiers)
+        safe_capacity = int(current_hr * 0.85 / TIER_BUCKET_HR) * TIER_BUCKET_HR
+        _, threshold = get_tier_info(safe_capacity, self.state_manager.get_tiers())
         return threshold
 
     def _get_needed_time(self, current_hr, target_hr):
         """
         Computes the precise duration (in milliseconds) required to sustain the target average.
         
-        Formula: (Target Hashrate / Current Hashrate) * Cycle Length
+        Formula: ceil(Target Hashrate * Cycle Length / Current Hashrate), evaluated in integers.
+        Rounding the buffered target up and flooring the current hashrate to whole H/s
+        only ever lengthens the allocation.
         """
-        if current_hr == 0: return 0
+        hr = int(current_hr)
+        if hr <= 0: return 0
         # Apply buffer to target hashrate to prevent dropping below threshold
-        target_with_buffer = target_hr * (1.0 + self.target_buffer)
-        needed = (target_with_buffer / current_hr) * XVB_TIME_ALGO_MS
+        target_with_buffer = math.ceil(target_hr * (1.0 + self.target_buffer))
+        needed = (target_with_buffer * XVB_TIME_ALGO_MS + hr - 1) // hr
         
         # Add switching overhead compensation
-        needed += XVB_SWITCH_OVERHEAD_MS
-        
-        return math.ceil(needed)
+        return needed + XVB_SWITCH_OVERHEAD_MS
+
+    async def _wait_for_change(self, seconds):
+        """
+        Sleeps for up to `seconds`, returning early if the state manager signals a change.
+
+        Returns:
+            bool: True if woken by a state change, False if the full duration elapsed.
+        """
+        event = self.state_manager.changed_event
+        try:
+            await asyncio.wait_for(event.wait(), timeout=seconds)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            event.clear()
 
     async def run(self):
         """
@@ -179,49 +279,78 @@ class AlgoService:
         """
         logger.info("Service Started: Algorithm Control Loop")
         await asyncio.sleep(5) 
+        loop = asyncio.get_running_loop()
         
+        # Cycle phases are scheduled against absolute (monotonic) deadlines so that switch
+        # RPC latency is absorbed instead of extending the cycle. A state-change wake only
+        # re-evaluates the decision inside the current cycle: the cycle keeps its deadline
+        # and the XvB time already served counts toward a SPLIT slice.
+        cycle_deadline = 0.0
+        xvb_served = 0.0  # Seconds mined on XvB in the current cycle
+
         while True:
+            now = loop.time()
+            if now >= cycle_deadline:
+                cycle_deadline = now + XVB_TIME_ALGO_MS / 1000
+                xvb_served = 0.0
             try:
                 # Access latest data from DataService
                 latest_data = self.data_service.latest_data
                 
                 # Use 10s average for immediate reaction to hashrate drops
-                current_hr = latest_data.get("total_live_h10", 0)
+                current_hr = latest_data.total_live_h10
                 if current_hr == 0:
-                    current_hr = latest_data.get("total_live_h15", 0)
+                    current_hr = latest_data.total_live_h15
 
                 # Use 15m average for stable tier selection
-                stable_hr = latest_data.get("total_live_h15", 0)
+                stable_hr = latest_data.total_live_h15
                 if stable_hr == 0:
                     stable_hr = current_hr
 
-                p2pool_data = latest_data.get("pool", {})
-                p2pool_stats = p2pool_data.get("pool", {})
-                p2p_stats = p2pool_data.get("p2p", {})
+                # Idle fast path: with no hashrate no donation tier can qualify, so the
+                # outcome is always P2POOL; skip the state reads and decision evaluation.
+                if current_hr == 0 and stable_hr == 0:
+                    await self.switch_miners("P2POOL", state_label="P2POOL")
+                    await self._wait_for_change(max(0, cycle_deadline - loop.time()))
+                    continue
+
+                # PPLNS window and its share count are precomputed on each data tick
+                window_duration = latest_data.pplns_window_sec
+                shares_in_window = latest_data.shares_in_window
                 xvb_stats = self.state_manager.get_xvb_stats()
-                shares = latest_data.get("shares", [])
                 
                 # Execute decision logic
-                decision, xvb_duration = self.get_decision(current_hr, stable_hr, p2pool_stats, p2p_stats, xvb_stats, shares)
+                decision, xvb_duration = self.get_decision(current_hr, stable_hr, window_duration, shares_in_window, xvb_stats)
                 
+                # Cycle sleeps are preempted by state changes (worker set, XvB failures)
+                # so the decision is re-evaluated immediately instead of at the cycle end.
                 if decision == "P2POOL":
                     await self.switch_miners("P2POOL", state_label="P2POOL")
-                    await asyncio.sleep(XVB_TIME_ALGO_MS / 1000)
+                    await self._wait_for_change(max(0, cycle_deadline - loop.time()))
                     
                 elif decision == "XVB":
                     await self.switch_miners("XVB", state_label="XVB")
-                    await asyncio.sleep(XVB_TIME_ALGO_MS / 1000)
+                    started = loop.time()
+                    await self._wait_for_change(max(0, cycle_deadline - started))
+                    xvb_served += loop.time() - started
                     
                 elif decision == "SPLIT":
-                    # Split Mode: Allocate time slice to XvB, remainder to P2Pool
-                    await self.switch_miners("XVB", state_label="XVB (Split)")
-                    await asyncio.sleep(xvb_duration / 1000)
+                    # Split Mode: Allocate time slice to XvB (less what this cycle already
+                    # donated), remainder to P2Pool
+                    xvb_remaining = xvb_duration / 1000 - xvb_served
+                    if xvb_remaining > 0:
+                        await self.switch_miners("XVB", state_label="XVB (Split)")
+                        started = loop.time()
+                        woken = await self._wait_for_change(max(0, min(xvb_remaining, cycle_deadline - started)))
+                        xvb_served += loop.time() - started
+                        if woken:
+                            continue
                     
-                    remainder = (XVB_TIME_ALGO_MS - xvb_duration) / 1000
+                    remainder = cycle_deadline - loop.time()
                     if remainder > 0:
                         await self.switch_miners("P2POOL", state_label="P2POOL (Split)")
-                        await asyncio.sleep(remainder)
+                        await self._wait_for_change(max(0, cycle_deadline - loop.time()))
 
             except Exception as e:
                 logger.error(f"Algorithm Error: {e}")
-                await asyncio.sleep(10)
\ No newline at end of file
+                await asyncio.sleep(10)
@@ -1,17 +1,97 @@
 import asyncio
 import logging
 import time
-from aiohttp import ClientSession, TCPConnector
+from collections import deque
+from dataclasses import dataclass, field, fields
+from itertools import islice, takewhile
+from typing import Any
+from aiohttp import ClientSession, ClientTimeout, TCPConnector
 
-from config.config import UPDATE_INTERVAL
+from config.config import (
+    UPDATE_INTERVAL, XVB_FAIL_THRESHOLD, XVB_SYNC_INTERVAL, XVB_SYNC_TIMEOUT, SNAPSHOT_EVERY_TICKS,
+    SNAPSHOT_FORCE_TICKS, WORKER_CONCURRENCY, WORKER_FANOUT_TIMEOUT, HASHRATE_EWMA_ALPHA
+)
 from client.xmrig_client import XMRigWorkerClient
 from client.tari.tari_client import TariClient
+from helper.actor import BlockingClientActor
+from helper.utils import dumps_json
 from collector.pools import get_p2pool_stats, get_network_stats, get_stratum_stats, get_tari_stats
 from collector.logs import get_monero_sync_status
 from collector.system import get_disk_usage, get_hugepages_status, get_memory_usage, get_load_average, get_cpu_usage
 
 logger = logging.getLogger("DataService")
 
+# Maximum number of shares kept in the in-memory share log
+SHARE_LOG_SIZE = 10000
+
+def _collect_system_bundle():
+    """Reads all host metrics in one pass so they occupy a single worker thread."""
+    return {
+        "disk": get_disk_usage(),
+        "hugepages": get_hugepages_status(),
+        "memory": get_memory_usage(),
+        "load": get_load_average(),
+        "cpu_percent": get_cpu_usage()
+    }
+
+def _parse_list_worker(w):
+    """Parses a worker row in the list format (XMRig Proxy 6.x+)."""
+    # Proxy returns kH/s, convert to H/s
+    # Mapping: 1m(idx8)->10s & 60s (Proxy lacks 10s), 10m(idx9)->15m
+    h60 = w[8] * 1000
+    return {
+        "name": w[0],
+        "ip": w[1],
+        "status": "online",
+        "h10": h60,
+        "h60": h60,
+        "h15": w[9] * 1000,
+        "uptime": 0
+    }
+
+def _parse_dict_worker(w):
+    """Parses a worker entry in the dict format (Legacy)."""
+    hr = w.get("hashrate", [0, 0, 0])
+    return {
+        "name": w.get("id", "Unknown"),
+        "ip": w.get("ip", "0.0.0.0"),
+        "status": "online",
+        "h10": hr[0] if len(hr) > 0 else 0,
+        "h60": hr[1] if len(hr) > 1 else 0,
+        "h15": hr[2] if len(hr) > 2 else 0,
+        "uptime": w.get("uptime", 0)
+    }
+
+@dataclass(frozen=True, slots=True)
+class LatestData:
+    """
+    Immutable snapshot of the collected mining state, published once per collection tick.
+
+    Readers access fields as attributes (slot loads) instead of dict lookups with defaults.
+    """
+    workers: list = field(default_factory=list)
+    total_live_h15: float = 0
+    total_live_h10: float = 0
+    pool: dict = field(default_factory=lambda: {"p2p": {}, "pool": {}})
+    network: dict = field(default_factory=dict)
+    system: dict = field(default_factory=dict)
+    tari: dict = field(default_factory=dict)
+    stratum: dict = field(default_factory=dict)
+    monero_sync: dict = field(default_factory=dict)
+    tari_sync: dict = field(default_factory=dict)
+    global_sync: bool = False
+    shares: Any = field(default_factory=deque)
+    pplns_window_sec: int = 0
+    pplns_cutoff_ts: float = 0
+    shares_in_window: int = 0
+    timestamp: int = 0  # Unix epoch milliseconds
+
+    def items(self):
+        """Yields (field name, value) pairs, e.g. to fill a JSON snapshot dict."""
+        return ((name, getattr(self, name)) for name in LATEST_DATA_FIELDS)
+
+LATEST_DATA_FIELDS = tuple(f.name for f in fields(LatestData))
+
 class DataService:
     """
     Core service responsible for aggregating mining statistics from various sources
@@ -21,29 +101,78 @@ class DataService:
         self.state_manager = state_manager
         self.proxy_client = proxy_client
         self.xvb_client = xvb_client
-        
-        self.latest_data = {
-            "workers": [],
-            "total_live_h15": 0,
-            "total_live_h10": 0,
-            "pool": {"p2p": {}, "pool": {}},
-            "network": {},
-            "system": {},
-            "tari": {},
-            "stratum": {},
-            "monero_sync": {},
-            "tari_sync": {},
-            "global_sync": False,
-            "timestamp": 0
-        }
+
+        # Dedicated serial writer thread for the state database (shared with AlgoService)
+        self.db_actor = BlockingClientActor("db-actor")
+
+        # Exponentially smoothed aggregate hashrate recorded in history (None until the first tick)
+        self._ewma_hr = None
+
+        # Bounds the per-tick worker API fan-out so large farms don't burst the connector
+        self._worker_sem = asyncio.Semaphore(WORKER_CONCURRENCY)
+
+        # Proxy worker row parser, specialized on the first response's format
+        self._parse_proxy = None
+
+        # Shared HTTP session and clients, opened by start() and closed by stop()
+        self._session = None
+        self._worker_client = None
+        self._tari_client = None
+
+        # Reusable snapshot dict: shares references with the published state except for `shares`
+        self._snapshot_view = {}
+
+        # Digest of the last persisted snapshot and ticks since it was written
+        self._last_snapshot_digest = None
+        self._ticks_since_snapshot = 0
         
         # Restore persistent state from DB to prevent empty dashboard on service restart
+        # (keys from older snapshot formats that are no longer fields are dropped)
+        restored = {}
         loaded_snapshot = self.state_manager.load_snapshot()
         if loaded_snapshot and isinstance(loaded_snapshot, dict):
-            self.latest_data.update(loaded_snapshot)
+            restored = {k: v for k, v in loaded_snapshot.items() if k in LATEST_DATA_FIELDS}
         
-        if "shares" not in self.latest_data:
-            self.latest_data["shares"] = []
+        # Share log is an append-only ring buffer shared by reference across snapshots
+        self._shares = deque(restored.pop("shares", None) or (), maxlen=SHARE_LOG_SIZE)
+        # Parallel, ascending share timestamps for window counts without dict lookups
+        self._share_ts = deque((s.get("ts", 0) for s in self._shares), maxlen=SHARE_LOG_SIZE)
+
+        # Readers (AlgoService, WebServer) get a consistent, immutable view with one attribute
+        # load; each collection tick publishes a fresh snapshot by rebinding this reference.
+        self.latest_data = LatestData(shares=self._shares, **restored)
+
+    async def start(self):
+        """
+        Opens the shared HTTP session and the clients built on it.
+
+        The session is owned by the service rather than by `run()`, so pooled keep-alive
+        connections survive a restart of the collection task. Calling it again is a no-op.
+        """
+        if self._session is not None and not self._session.closed:
+            return
+
+        # Keep miner connections alive across ticks (aiohttp's 15s default is shorter than
+        # UPDATE_INTERVAL); aiohttp already enables TCP_NODELAY on client transports.
+        # Every worker is its own host, so the per-host cap only bounds duplicate fetches.
+        connector = TCPConnector(
+            ssl=False,
+            force_close=False,
+            keepalive_timeout=UPDATE_INTERVAL * 2,
+            limit=32,
+            limit_per_host=8,
+            ttl_dns_cache=300,
+            enable_cleanup_closed=True
+        )
+        self._session = ClientSession(connector=connector, timeout=ClientTimeout(total=5, connect=2))
+        self._worker_client = XMRigWorkerClient(self._session)
+        self._tari_client = TariClient(self._session)
+
+    async def stop(self):
+        """Closes the shared HTTP session opened by `start()`."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
 
     async def run(self):
         """
@@ -51,188 +180,369 @@ class DataService:
         Updates the `latest_data` state and persists historical metrics to the database.
         """
         logger.info("Service Started: Data Collection Loop")
-        
-        iteration_count = 0 
-        
-        async with ClientSession(connector=TCPConnector(verify_ssl=False)) as session:
-            worker_client = XMRigWorkerClient(session)
-            tari_client = TariClient(session)
-            
-            # Initialize share tracking
-            last_known_share_ts = 0
-            if self.latest_data.get("shares"):
-                try:
-                    last_known_share_ts = self.latest_data["shares"][-1].get("ts", 0)
-                except (IndexError, KeyError, TypeError):
-                    pass
+        await self.start()
+        worker_client = self._worker_client
+        tari_client = self._tari_client
+
+        # Worker names seen on the previous tick, used to detect membership changes
+        last_worker_names = None
+
+        # Initialize share tracking
+        last_known_share_ts = 0
+        if self._shares:
+            try:
+                last_known_share_ts = self._shares[-1].get("ts", 0)
+            except (IndexError, KeyError, TypeError):
+                pass
+
+        # Ticks are scheduled on a fixed monotonic grid so slow ticks do not drift the cadence
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
 
-            while True:
+        while True:
+            next_tick += UPDATE_INTERVAL
+            try:
+                # 1. Launch Local Collectors concurrently (file/procfs reads on worker threads,
+                #    sync checks on the loop); awaited after the worker fetch below.
+                local_results = asyncio.gather(
+                    asyncio.to_thread(get_stratum_stats),
+                    asyncio.to_thread(get_network_stats),
+                    asyncio.to_thread(get_tari_stats),
+                    asyncio.to_thread(get_p2pool_stats),
+                    asyncio.to_thread(_collect_system_bundle),
+                    get_monero_sync_status(),
+                    tari_client.get_sync_status(),
+                    return_exceptions=True
+                )
+                
+                # 2. Fetch Worker Statistics from XMRig Proxy
+                proxy_workers = []
                 try:
-                    # 1. Collect Local Statistics (High Frequency Polling)
-                    stratum_raw, worker_configs = get_stratum_stats()
-                    
-                    # 2. Fetch Worker Statistics from XMRig Proxy
-                    proxy_workers = []
-                    try:
-                        proxy_data = await asyncio.to_thread(self.proxy_client.get_workers)
-                        if proxy_data and "workers" in proxy_data:
-                            for w in proxy_data["workers"]:
-                                # Handle list format (XMRig Proxy 6.x+)
-                                if isinstance(w, list) and len(w) >= 13:
-                                    proxy_workers.append({
-                                        "name": w[0],
-                                        "ip": w[1],
-                                        "status": "online",
-                                        # Proxy returns kH/s, convert to H/s
-                                        # Mapping: 1m(idx8)->10s & 60s (Proxy lacks 10s), 10m(idx9)->15m
-                                        "h10": w[8] * 1000,
-                                        "h60": w[8] * 1000,
-                                        "h15": w[9] * 1000,
-                                        "uptime": 0 
-                                    })
-                                # Handle dict format (Legacy)
-                                elif isinstance(w, dict):
-                                    hr = w.get("hashrate", [0, 0, 0])
-                                    proxy_workers.append({
-                                        "name": w.get("id", "Unknown"),
-                                        "ip": w.get("ip", "0.0.0.0"),
-                                        "status": "online",
-                                        "h10": hr[0] if len(hr) > 0 else 0,
-                                        "h60": hr[1] if len(hr) > 1 else 0,
-                                        "h15": hr[2] if len(hr) > 2 else 0,
-                                        "uptime": w.get("uptime", 0)
-                                    })
-                    except Exception as e:
-                        logger.error(f"Proxy Data Fetch Error: {e}")
-
-                    # 3. Augment with Direct Worker Stats (Uptime, Hashrate) via Local API
-                    tasks = [worker_client.get_stats(w['ip'], w['name']) for w in proxy_workers]
-                    worker_results = await asyncio.gather(*tasks)
-
-                    final_workers = []
-                    current_mode = self.state_manager.get_xvb_stats().get("current_mode", "P2POOL")
-                    
-                    # Determine active pool port for UI badges based on current Algo mode
-                    active_pool_port = "3344" if "XVB" in current_mode else "3333"
-
-                    for w, extra_stats in zip(proxy_workers, worker_results):
-                        if extra_stats:
-                            w['uptime'] = extra_stats.get('uptime', w['uptime'])
-                            
-                            # Prefer direct worker stats for hashrate if available
-                            hr_total = extra_stats.get('hashrate', {}).get('total', [])
-                            if isinstance(hr_total, list) and len(hr_total) >= 3:
-                                w['h10'] = hr_total[0] if hr_total[0] is not None else 0
-                                w['h60'] = hr_total[1] if hr_total[1] is not None else 0
-                                w['h15'] = hr_total[2] if hr_total[2] is not None else 0
-                        else:
-                            w['status'] = 'unreachable'
-                        
-                        w['active_pool'] = active_pool_port
-                        final_workers.append(w)
-                    
-                    # 4. Calculate Aggregates (Priority: 15m > 60s > 10s)
-                    total_hr = 0
-                    total_h10 = 0
-                    for w in final_workers:
-                        if w.get('status') == 'online':
-                            w_hr = w.get('h15', 0)
-                            if w_hr == 0:
-                                w_hr = w.get('h60', 0)
-                            if w_hr == 0:
-                                w_hr = w.get('h10', 0)
-                            total_hr += w_hr
-                            total_h10 += w.get('h10', 0)
-                    
-                    # 5. Fetch Network & Sync Status
-                    network_stats = get_network_stats()
-                    tari_stats = get_tari_stats()
-                    p2pool_stats = get_p2pool_stats()
-
-                    # Track P2Pool Shares
-                    current_share_ts = p2pool_stats["pool"].get("last_share_time", 0)
-                    if current_share_ts > last_known_share_ts:
-                        if current_share_ts > 0:
-                            self.latest_data["shares"].append({
-                                "ts": current_share_ts,
-                                "difficulty": p2pool_stats["pool"].get("difficulty", 0)
-                            })
-                            # Keep last 10000 shares to prevent unbounded growth
-                            if len(self.latest_data["shares"]) > 10000:
-                                self.latest_data["shares"] = self.latest_data["shares"][-10000:]
-                        last_known_share_ts = current_share_ts
-
-                    monero_sync = await get_monero_sync_status()
-                    tari_sync = await tari_client.get_sync_status()
-
-                    # Determine effective Tari status for UI display
-                    tari_active = tari_stats.get('active', False)
-                    tari_status_str = tari_stats.get('status', 'Waiting...') if tari_active else 'Waiting...'
-
-                    # Apply Sync Logic Overrides
-                    # 1. Monero Sync Check
-                    if network_stats.get('height', 0) == 0:
-                        monero_sync['is_syncing'] = True
-                        if 'percent' not in monero_sync:
-                            monero_sync.update({'percent': 0, 'current': 0, 'target': 1})
-                    
-                    # 2. Global Sync Logic
-                    # Show sync dashboard if either Monero or Tari is syncing
-                    is_monero_syncing = monero_sync.get('is_syncing', False)
-                    is_tari_syncing = tari_sync.get('is_syncing', False)
-                    global_sync = is_monero_syncing or is_tari_syncing
-
-                    if global_sync:
-                        # Ensure Monero stats are present if it's not the one syncing
-                        if not is_monero_syncing and 'percent' not in monero_sync:
-                            h = network_stats.get('height', 1)
-                            monero_sync.update({'percent': 100, 'current': h, 'target': h})
-                        
-                        # Ensure Tari stats are present if it's not the one syncing
-                        if not is_tari_syncing and 'percent' not in tari_sync:
-                            h = tari_stats.get('height', 0)
-                            tari_sync.update({'percent': 100, 'current': h, 'target': h})
-
-                    self.latest_data.update({
-                        "workers": final_workers,
-                        "total_live_h15": total_hr,
-                        "total_live_h10": total_h10,
-                        "pool": p2pool_stats,
-                        "network": network_stats,
-                        "tari": tari_stats,
-                        "monero_sync": monero_sync,
-                        "tari_sync": tari_sync,
-                        "global_sync": global_sync,
-                        "system": {
-                            "disk": get_disk_usage(),
-                            "hugepages": get_hugepages_status(),
-                            "memory": get_memory_usage(),
-                            "load": get_load_average(),
-                            "cpu_percent": get_cpu_usage()
-                        },
-                        "stratum": stratum_raw,
-                        "timestamp": time.time()
-                    })
-                    
-                    # 6. Persist Historical Data
-                    p2pool_hr = 0 if "XVB" in current_mode else total_hr
-                    xvb_hr = total_hr if "XVB" in current_mode else 0
-                    
-                    await asyncio.to_thread(self.state_manager.update_history, total_hr, p2pool_hr, xvb_hr)
-                    
-                    # Create a lightweight snapshot (exclude heavy transient data like shares)
-                    snapshot_data = self.latest_data.copy()
-                    snapshot_data["shares"] = snapshot_data.get("shares", [])[-100:] # Only persist last 100 shares
-                    await asyncio.to_thread(self.state_manager.save_snapshot, snapshot_data)
-
-                    # 7. External API Sync (Throttled to every 10th iteration)
-                    if iteration_count % 10 == 0:
-                        real_xvb_stats = await asyncio.to_thread(self.xvb_client.get_stats)
-                        if real_xvb_stats:
-                            await asyncio.to_thread(self.state_manager.update_xvb_stats, **real_xvb_stats)
-                            logger.info(f"External Sync: XvB Stats Updated (1h={real_xvb_stats['avg_1h']:.0f} H/s)")
-                    
-                    iteration_count += 1
+                    proxy_data = await self.proxy_client.get_workers()
+                    raw_workers = proxy_data.get("workers") if proxy_data else None
+                    if raw_workers:
+                        # The payload format is fixed per proxy version: detect it on the first
+                        # response and reuse the specialized parser on every later tick
+                        if self._parse_proxy is None:
+                            self._parse_proxy = (
+                                _parse_list_worker if isinstance(raw_workers[0], list) else _parse_dict_worker
+                            )
+                        parse = self._parse_proxy
+                        proxy_workers = [parse(w) for w in raw_workers]
                 except Exception as e:
-                    logger.error(f"Data Collection Error: {e}")
-                await asyncio.sleep(UPDATE_INTERVAL)
\ No newline at end of file
+                    # A proxy upgrade may change the format: re-detect on the next tick
+                    self._parse_proxy = None
+                    logger.error("Proxy Data Fetch Error: %s", e)
+
+                # 3. Augment with Direct Worker Stats (Uptime, Hashrate) via Local API
+                worker_results = await self._fetch_worker_stats(worker_client, proxy_workers)
+
+                # Wake the algorithm loop when workers join or leave
+                worker_names = frozenset(w['name'] for w in proxy_workers)
+                if last_worker_names is not None and worker_names != last_worker_names:
+                    self.state_manager.changed_event.set()
+                last_worker_names = worker_names
+
+                current_mode = self.state_manager.get_xvb_stats().get("current_mode", "P2POOL")
+                is_xvb = "XVB" in current_mode
+                
+                # Determine active pool port for UI badges based on current Algo mode
+                active_pool_port = "3344" if is_xvb else "3333"
+
+                # 4. Merge Worker Stats and Calculate Aggregates in a single pass
+                final_workers, raw_total_hr, total_h10 = self._merge_worker_stats(
+                    proxy_workers, worker_results, active_pool_port
+                )
+
+                # Smooth the recorded history point so a rig briefly dropping out of one tick does
+                # not spike the chart. The published (algorithm-facing) total stays raw, and the
+                # average restarts from the raw value once no hashrate is left, so the history
+                # shows the drop instead of a decaying tail
+                if self._ewma_hr is None or raw_total_hr == 0:
+                    self._ewma_hr = raw_total_hr
+                else:
+                    self._ewma_hr += HASHRATE_EWMA_ALPHA * (raw_total_hr - self._ewma_hr)
+                history_hr = self._ewma_hr
+                
+                # 5. Gather Local, Network & Sync Status (failed collectors keep their last value)
+                prev_data = self.latest_data
+                (
+                    (stratum_raw, worker_configs), network_stats, tari_stats, p2pool_stats,
+                    system_stats, monero_sync, tari_sync
+                ) = self._with_fallbacks(await local_results, (
+                    ("stratum", (prev_data.stratum, [])),
+                    ("network", prev_data.network),
+                    ("tari", prev_data.tari),
+                    ("p2pool", prev_data.pool),
+                    ("system", prev_data.system),
+                    ("monero_sync", {"is_syncing": False}),
+                    ("tari_sync", {"is_syncing": False})
+                ))
+
+                # Track P2Pool Shares
+                current_share_ts = p2pool_stats["pool"].get("last_share_time", 0)
+                if current_share_ts > last_known_share_ts:
+                    if current_share_ts > 0:
+                        self._shares.append({
+                            "ts": current_share_ts,
+                            "difficulty": p2pool_stats["pool"].get("difficulty", 0)
+                        })
+                        self._share_ts.append(current_share_ts)
+                    last_known_share_ts = current_share_ts
+
+                # PPLNS window (Main/Mini=10s, Nano=30s blocks) and the shares found inside it,
+                # computed once per tick for both the algorithm and the UI
+                block_time = 30 if p2pool_stats["p2p"].get("type", "Main") == "Nano" else 10
+                pplns_window_sec = p2pool_stats["pool"].get("pplns_window", 2160) * block_time
+                pplns_cutoff_ts = time.time() - pplns_window_sec
+                shares_in_window = self.shares_in_window(pplns_cutoff_ts)
+
+                # Determine effective Tari status for UI display
+                tari_active = tari_stats.get('active', False)
+                tari_status_str = tari_stats.get('status', 'Waiting...') if tari_active else 'Waiting...'
+
+                # Apply Sync Logic Overrides
+                # 1. Monero Sync Check
+                if network_stats.get('height', 0) == 0:
+                    monero_sync['is_syncing'] = True
+                    if 'percent' not in monero_sync:
+                        monero_sync.update({'percent': 0, 'current': 0, 'target': 1})
+                
+                # 2. Global Sync Logic
+                # Show sync dashboard if either Monero or Tari is syncing
+                is_monero_syncing = monero_sync.get('is_syncing', False)
+                is_tari_syncing = tari_sync.get('is_syncing', False)
+                global_sync = is_monero_syncing or is_tari_syncing
+
+                if global_sync:
+                    # Ensure Monero stats are present if it's not the one syncing
+                    if not is_monero_syncing and 'percent' not in monero_sync:
+                        h = network_stats.get('height', 1)
+                        monero_sync.update({'percent': 100, 'current': h, 'target': h})
+                    
+                    # Ensure Tari stats are present if it's not the one syncing
+                    if not is_tari_syncing and 'percent' not in tari_sync:
+                        h = tari_stats.get('height', 0)
+                        tari_sync.update({'percent': 100, 'current': h, 'target': h})
+
+                # Publish the new state atomically (single reference rebind)
+                self.latest_data = LatestData(
+                    workers=final_workers,
+                    total_live_h15=raw_total_hr,
+                    total_live_h10=total_h10,
+                    pool=p2pool_stats,
+                    network=network_stats,
+                    tari=tari_stats,
+                    monero_sync=monero_sync,
+                    tari_sync=tari_sync,
+                    global_sync=global_sync,
+                    system=system_stats,
+                    stratum=stratum_raw,
+                    shares=self._shares,
+                    pplns_window_sec=pplns_window_sec,
+                    pplns_cutoff_ts=pplns_cutoff_ts,
+                    shares_in_window=shares_in_window,
+                    timestamp=time.time_ns() // 1_000_000
+                )
+                
+                # 6. Persist Historical Data
+                p2pool_hr = 0 if is_xvb else history_hr
+                xvb_hr = history_hr - p2pool_hr
+                
+                # The snapshot only serves restarts: persist it on a slower cadence, and
+                # skip the DB write when nothing but volatile fields changed since the last save
+                snapshot_payload = None
+                self._ticks_since_snapshot += 1
+                if self._ticks_since_snapshot >= SNAPSHOT_EVERY_TICKS:
+                    snapshot_digest = self._snapshot_digest()
+                    if (snapshot_digest != self._last_snapshot_digest
+                            or self._ticks_since_snapshot >= SNAPSHOT_FORCE_TICKS):
+                        snapshot_payload = dumps_json(self._build_snapshot())
+                        self._last_snapshot_digest = snapshot_digest
+                        self._ticks_since_snapshot = 0
+
+                # History point and snapshot share one hop to the DB thread (and one commit)
+                await self.db_actor.call(
+                    self.state_manager.persist_tick, history_hr, p2pool_hr, xvb_hr, snapshot_payload
+                )
+
+            except Exception as e:
+                logger.error("Data Collection Error: %s", e, exc_info=True)
+
+            now = loop.time()
+            if now > next_tick:
+                # Tick overran its slot: resynchronize instead of bursting to catch up
+                next_tick = now
+            await asyncio.sleep(next_tick - now)
+
+    def shares_in_window(self, cutoff):
+        """
+        Counts the tracked shares found at or after `cutoff`.
+
+        Shares are appended in timestamp order, so the count walks the timestamps
+        from the newest end and stops at the first one older than `cutoff`.
+
+        Args:
+            cutoff (float): Unix timestamp marking the start of the window.
+
+        Returns:
+            int: Number of shares with `ts >= cutoff`.
+        """
+        return sum(1 for _ in takewhile(lambda ts: ts >= cutoff, reversed(self._share_ts)))
+
+    async def _fetch_worker_stats(self, worker_client, proxy_workers):
+        """
+        Fetches direct API stats for every proxy worker within WORKER_FANOUT_TIMEOUT.
+
+        Workers that have not answered when the deadline passes are cancelled and reported
+        as empty results (rendered as unreachable), so the fan-out never overruns a tick.
+
+        Returns:
+            list: Stats dicts aligned with `proxy_workers` ({} for failed or timed out workers).
+        """
+        if not proxy_workers:
+            return []
+
+        tasks = [
+            asyncio.ensure_future(self._bounded_worker_stats(worker_client, w['ip'], w['name']))
+            for w in proxy_workers
+        ]
+        done, pending = await asyncio.wait(tasks, timeout=WORKER_FANOUT_TIMEOUT)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning("Worker API fan-out timed out for %d worker(s)", len(pending))
+
+        return [task.result() if task in done and task.exception() is None else {} for task in tasks]
+
+    async def _bounded_worker_stats(self, worker_client, ip, name):
+        """Fetches one worker's direct API stats, limited to WORKER_CONCURRENCY in flight."""
+        async with self._worker_sem:
+            return await worker_client.get_stats(ip, name)
+
+    def _build_snapshot(self):
+        """Refreshes the reusable snapshot dict in place (only the last 100 shares are persisted)."""
+        snapshot_data = self._snapshot_view
+        snapshot_data.update(self.latest_data.items())
+        snapshot_data["shares"] = list(islice(self._shares, max(0, len(self._shares) - 100), None))
+        return snapshot_data
+
+    def _snapshot_digest(self):
+        """
+        Hashes a small projection of the published state that captures meaningful changes
+        (worker set and hashrates, chain height, newest share, sync state), so an unchanged
+        state is detected without serializing the snapshot.
+
+        Hashrates are quantized to 100 H/s (as in the algorithm's decision key); raw values
+        jitter on every tick and would make every digest differ.
+        """
+        data = self.latest_data
+        return hash((
+            tuple((w['name'], round(w['h15'] or 0, -2), w['status']) for w in data.workers),
+            round(data.total_live_h15, -2),
+            data.network.get('height'),
+            self._share_ts[-1] if self._share_ts else 0,
+            data.global_sync
+        ))
+
+    @staticmethod
+    def _with_fallbacks(results, fallbacks):
+        """
+        Replaces failed results of a `gather(..., return_exceptions=True)` call.
+
+        Args:
+            results (list): Gathered results, possibly containing exceptions.
+            fallbacks (tuple): (collector name, fallback value) for each position, in gather order.
+
+        Returns:
+            list: Results with every exception swapped for its fallback.
+        """
+        resolved = []
+        for result, (name, fallback) in zip(results, fallbacks):
+            if isinstance(result, Exception):
+                logger.warning("Collector Error (%s), keeping last value: %s", name, result)
+                resolved.append(fallback)
+            else:
+                resolved.append(result)
+        return resolved
+
+    @staticmethod
+    def _merge_worker_stats(proxy_workers, worker_results, active_pool_port):
+        """
+        Merges direct worker API stats into the proxy worker entries and accumulates
+        the hashrate aggregates in the same pass.
+
+        Args:
+            proxy_workers (list): Worker dicts parsed from the XMRig Proxy.
+            worker_results (list): Direct worker API responses, aligned with `proxy_workers`.
+            active_pool_port (str): Pool port shown on the UI badge for every worker.
+
+        Returns:
+            tuple: (workers, total_hr, total_h10) where `total_hr` prefers 15m > 60s > 10s.
+        """
+        final_workers = []
+        append = final_workers.append
+        total_hr = 0
+        total_h10 = 0
+
+        for w, extra_stats in zip(proxy_workers, worker_results):
+            if extra_stats:
+                get = extra_stats.get
+                w['uptime'] = get('uptime', w['uptime'])
+
+                # Prefer direct worker stats for hashrate if available
+                hr_total = (get('hashrate') or {}).get('total') or ()
+                if isinstance(hr_total, (list, tuple)) and len(hr_total) >= 3:
+                    w['h10'] = hr_total[0] or 0
+                    w['h60'] = hr_total[1] or 0
+                    w['h15'] = hr_total[2] or 0
+            else:
+                w['status'] = 'unreachable'
+
+            w['active_pool'] = active_pool_port
+            append(w)
+
+            if w['status'] == 'online':
+                # Priority 15m > 60s > 10s as one short-circuit chain; `or 0` also absorbs
+                # null readings from the legacy proxy format
+                h10 = w['h10'] or 0
+                total_hr += w['h15'] or w['h60'] or h10
+                total_h10 += h10
+
+        return final_workers, total_hr, total_h10
+
+    async def fetch_xvb_stats(self):
+        """Fetches external XvB statistics and updates the persisted XvB state."""
+        real_xvb_stats = await self.xvb_client.get_stats()
+        if not real_xvb_stats:
+            return
+
+        prev_fail_count = self.state_manager.get_xvb_stats().get("fail_count", 0)
+        await self.db_actor.call(self.state_manager.update_xvb_stats, **real_xvb_stats)
+
+        # Wake the algorithm loop when the failure fallback threshold is crossed
+        new_fail_count = real_xvb_stats.get("fail_count", 0)
+        if (prev_fail_count >= XVB_FAIL_THRESHOLD) != (new_fail_count >= XVB_FAIL_THRESHOLD):
+            self.state_manager.changed_event.set()
+        logger.info("External Sync: XvB Stats Updated (1h=%.0f H/s)", real_xvb_stats['avg_1h'])
+
+    def close(self):
+        """Stops the database thread once its queued writes have completed, then saves a final snapshot."""
+        self.db_actor.close()
+        self.state_manager.save_snapshot(dumps_json(self._build_snapshot()))
+
+    async def run_xvb_sync(self):
+        """
+        External API sync loop: Refreshes XvB statistics on its own cadence so a slow
+        or hanging XvB endpoint never stalls the local data collection loop.
+        """
+        logger.info("Service Started: XvB Sync Loop")
+
+        while True:
+            try:
+                await asyncio.wait_for(self.fetch_xvb_stats(), timeout=XVB_SYNC_TIMEOUT)
+            except asyncio.TimeoutError:
+                logger.error("XvB Sync Error: Timed out after %ss", XVB_SYNC_TIMEOUT)
+            except Exception as e:
+                logger.error("XvB Sync Error: %s", e)
+            await asyncio.sleep(XVB_SYNC_INTERVAL)
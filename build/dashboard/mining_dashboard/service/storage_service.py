@@ -1,13 +1,71 @@
+import asyncio
+import atexit
 import sqlite3
 import threading
 import logging
 import json
-import os
 import time
-import random
-from collections import deque
-from typing import Dict, List, Optional, Any
-from config.config import DB_FILE_PATH, TIER_DEFAULTS, HISTORY_RETENTION_SEC, WORKER_RETENTION_SEC
+import zlib
+from array import array
+from bisect import bisect_left
+from contextlib import contextmanager
+from types import MappingProxyType
+from typing import Dict, List, Optional, Any, Union
+from config.config import (
+    DB_FILE_PATH, TIER_DEFAULTS, HISTORY_RETENTION_SEC, WORKER_RETENTION_SEC,
+    HISTORY_FLUSH_BATCH, HISTORY_FLUSH_INTERVAL, RETENTION_PRUNE_EVERY, RETENTION_PRUNE_LIMIT
+)
+from helper.utils import dumps_json, loads_json
+
+# History columns, each held as a packed float64 array (timestamps ascending)
+HISTORY_COLUMNS = ("timestamp", "v", "v_p2pool", "v_xvb")
+
+# Schema revision recorded in PRAGMA user_version once all migrations have been applied
+SCHEMA_VERSION = 4
+
+# Rows fetched per round trip when streaming the history table at startup
+HISTORY_LOAD_CHUNK = 10000
+
+# History table layout (also the target of the v2 rebuild); `t` labels are derived from `timestamp`
+_SQL_CREATE_HISTORY = "CREATE TABLE IF NOT EXISTS {table} (timestamp INTEGER NOT NULL, v REAL, v_p2pool REAL, v_xvb REAL)"
+# Workers are small rows looked up by name, so they live in the primary-key B-tree itself
+_SQL_CREATE_WORKERS = "CREATE TABLE IF NOT EXISTS {table} (name TEXT PRIMARY KEY, ip TEXT, last_seen REAL) WITHOUT ROWID"
+
+# Write statements issued on every flush/update. Keeping each as one shared string lets
+# sqlite3's per-connection statement cache hand back the prepared statement on every call
+_SQL_INSERT_HISTORY = "INSERT INTO history (v, v_p2pool, v_xvb, timestamp) VALUES (?, ?, ?, ?)"
+# Bounded via a rowid subquery (DELETE ... LIMIT needs a non-default SQLite build option)
+_SQL_PRUNE_HISTORY = "DELETE FROM history WHERE rowid IN (SELECT rowid FROM history WHERE timestamp < ? LIMIT ?)"
+# Upserts update existing rows in place (OR REPLACE would delete and re-insert them)
+_SQL_UPSERT_KV = "INSERT INTO kv_store (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value"
+_SQL_UPSERT_WORKER = (
+    "INSERT INTO workers (name, ip, last_seen) VALUES (?, ?, ?) "
+    "ON CONFLICT(name) DO UPDATE SET ip = excluded.ip, last_seen = excluded.last_seen"
+)
+_SQL_PRUNE_WORKERS = "DELETE FROM workers WHERE last_seen < ?"
+_SQL_UPSERT_SNAPSHOT = "INSERT INTO snapshots (name, data) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET data = excluded.data"
+
+# Snapshot payload framing: a format version byte followed by the zlib-compressed JSON document.
+# Rows written before compression hold bare JSON, which always starts with '{'.
+_SNAPSHOT_FORMAT_ZLIB = b'\x01'
+_SNAPSHOT_ZLIB_LEVEL = 3
+# Row of the snapshots table holding the latest application state
+_SNAPSHOT_NAME = "latest_data"
+
+def _encode_snapshot(data: Union[Dict[str, Any], bytes]) -> bytes:
+    """Encodes a snapshot (state dict or its JSON bytes) into the versioned, compressed payload."""
+    raw = data if isinstance(data, (bytes, bytearray)) else dumps_json(data)
+    return _SNAPSHOT_FORMAT_ZLIB + zlib.compress(raw, _SNAPSHOT_ZLIB_LEVEL)
+
+def _decode_snapshot(value: Union[str, bytes]) -> Any:
+    """Decodes a stored snapshot payload, accepting both the compressed and the legacy JSON format."""
+    if isinstance(value, bytes) and value[:1] == _SNAPSHOT_FORMAT_ZLIB:
+        value = zlib.decompress(value[1:])
+    return loads_json(value)
+
+def _empty_history() -> Dict[str, array]:
+    """Returns empty columnar hashrate history: one array per column in HISTORY_COLUMNS."""
+    return {name: array('d') for name in HISTORY_COLUMNS}
 
 class StateManager:
     """
@@ -16,35 +74,58 @@ class StateManager:
     Handles atomic file I/O to prevent data corruption and ensures state consistency
     across application restarts.
     """
+    # Default XvB statistics (copied into each instance's state). Their value types are also
+    # the schema used to restore persisted KV rows in load()
+    _XVB_DEFAULTS = MappingProxyType({
+        "total_donated_time": 0.0,
+        "current_mode": "P2POOL",
+        "avg_24h": 0.0,
+        "avg_1h": 0.0,
+        "fail_count": 0,
+        "last_update": 0.0
+    })
+    _XVB_TYPES = MappingProxyType({key: type(value) for key, value in _XVB_DEFAULTS.items()})
+
     def __init__(self):
         self.logger = logging.getLogger("StateManager")
         self.db_path = DB_FILE_PATH
         self._lock = threading.Lock()
         self._db_lock = threading.Lock()  # Lock for serializing DB access
+        # Signals the algorithm loop that mining state changed (set from the event loop thread only)
+        self.changed_event = asyncio.Event()
         self.state = {
-            "hashrate_history": deque(),
-            "known_workers": {}, # Persist worker IPs by name to prevent loss during XvB switching
-            "xvb": {
-                "total_donated_time": 0.0,
-                "current_mode": "P2POOL",
-                "avg_24h": 0.0,
-                "avg_1h": 0.0,
-                "fail_count": 0,
-                "last_update": 0.0
-            },
+            "hashrate_history": _empty_history(),  # Columns, see HISTORY_COLUMNS
+            "known_workers": {}, # Persist worker IPs by name to prevent loss during XvB switching (ordered by last_seen)
+            "xvb": dict(self._XVB_DEFAULTS),  # Values are immutable, so a shallow copy suffices
             # Initialize state with default values from configuration
             "tiers": TIER_DEFAULTS.copy()
         }
+
+        # History rows not yet written to the DB (flushed in batches of HISTORY_FLUSH_BATCH,
+        # or once the oldest buffered row is HISTORY_FLUSH_INTERVAL old)
+        self._pending_history = []
+        self._last_flush = time.monotonic()
+
+        # Rows/updates written since the last retention DELETE (pruned every RETENTION_PRUNE_EVERY)
+        self._history_rows_since_prune = 0
+        self._worker_updates_since_prune = 0
+
+        # Column copies handed out by get_history_columns, keyed by start index. Shared between
+        # readers until the history next changes (cleared under self._lock on every mutation)
+        self._history_views: Dict[int, Dict[str, array]] = {}
         
         # Initialize persistent DB connection
         # check_same_thread=False allows the connection to be used by multiple threads
         # (serialized via self._db_lock)
+        # Rows come back as plain tuples and are unpacked positionally (no sqlite3.Row wrapper)
         self._conn = sqlite3.connect(self.db_path, timeout=30.0, check_same_thread=False)
-        self._conn.row_factory = sqlite3.Row
         
         self._init_db()
         self.load()
 
+        # Last-resort flush + checkpoint if the process exits without running the app's cleanup hook
+        atexit.register(self.close)
+
     def _init_db(self):
         """Initializes the SQLite database schema and handles migrations."""
         try:
@@ -52,25 +133,87 @@ class StateManager:
                 # Enable WAL mode for better concurrency
                 self._conn.execute("PRAGMA journal_mode=WAL")
                 self._conn.execute("PRAGMA synchronous=NORMAL")
+                # Keep sort/index temporaries off disk and read the (small) DB through mmap
+                self._conn.execute("PRAGMA temp_store=MEMORY")
+                self._conn.execute("PRAGMA mmap_size=268435456")
+                # Page cache of up to 64 MiB; checkpoint the WAL every ~1000 pages and truncate
+                # it back to 64 MiB afterwards so it cannot grow without bound
+                self._conn.execute("PRAGMA cache_size=-65536")
+                self._conn.execute("PRAGMA wal_autocheckpoint=1000")
+                self._conn.execute("PRAGMA journal_size_limit=67108864")
                 
-                with self._conn:
+                with self._transaction():
+                    fresh = self._conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table'").fetchone() is None
+                    # Missing tables are created at the current layout; the migration steps
+                    # below are written to be harmless on them
                     self._create_tables()
+                    if fresh:
+                        self._set_schema_version()
                     self._migrate_db()
+                    self._create_indexes()
         except sqlite3.Error as e:
             self.logger.error(f"DB Init Error: {e}")
 
+    @contextmanager
+    def _transaction(self):
+        """
+        Runs the enclosed statements in one write transaction (caller holds `_db_lock`).
+
+        BEGIN IMMEDIATE takes the write lock up front, so a concurrent reader can never
+        force a deferred transaction to fail with SQLITE_BUSY halfway through.
+        """
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._conn
+        except BaseException:
+            self._conn.rollback()
+            raise
+        self._conn.commit()
+
     def _create_tables(self):
         """Creates necessary tables if they don't exist."""
-        self._conn.execute("CREATE TABLE IF NOT EXISTS history (t TEXT, v REAL, v_p2pool REAL, v_xvb REAL, timestamp REAL)")
-        self._conn.execute("CREATE TABLE IF NOT EXISTS workers (name TEXT PRIMARY KEY, ip TEXT, last_seen REAL)")
+        self._conn.execute(_SQL_CREATE_HISTORY.format(table="history"))
+        self._conn.execute(_SQL_CREATE_WORKERS.format(table="workers"))
         self._conn.execute("CREATE TABLE IF NOT EXISTS kv_store (key TEXT PRIMARY KEY, value TEXT)")
+        # Compressed state snapshots are kept apart from the small kv_store settings rows
+        self._conn.execute("CREATE TABLE IF NOT EXISTS snapshots (name TEXT PRIMARY KEY, data BLOB)")
+
+    def _create_indexes(self):
+        """Creates indexes once migrations have added the columns they cover."""
         self._conn.execute("CREATE INDEX IF NOT EXISTS idx_ts ON history(timestamp)")
+        # Retention prune and startup load filter workers by last_seen (a plain index also serves IS NULL)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_workers_last_seen ON workers(last_seen)")
 
     def _migrate_db(self):
-        """Handles schema migrations for existing databases."""
+        """
+        Brings an existing database up to SCHEMA_VERSION.
+
+        `user_version` records the last applied step, so only the steps above it run
+        (and none at all on a current database). Each step runs inside the init transaction.
+        """
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= SCHEMA_VERSION:
+            return
+
+        steps = ((1, self._migrate_v1), (2, self._migrate_v2), (3, self._migrate_v3), (4, self._migrate_v4))
+        for target, step in steps:
+            if version < target:
+                step()
+        self._set_schema_version()
+
+    def _set_schema_version(self):
+        """Records SCHEMA_VERSION in the database header."""
+        # PRAGMA values cannot be bound parameters; SCHEMA_VERSION is a module constant
+        self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _migrate_v1(self):
+        """
+        v1: Adds the breakdown/timestamp history columns and workers.last_seen.
+
+        Databases from before schema versioning may have any subset of these columns,
+        so this step (and only this step) still inspects the table layout.
+        """
         cursor = self._conn.cursor()
-        
-        # History Table Migrations
         cursor.execute("PRAGMA table_info(history)")
         columns = {info[1] for info in cursor.fetchall()}
         
@@ -85,10 +228,9 @@ class StateManager:
         if 'timestamp' not in columns:
             self.logger.info("Migrating DB: Adding timestamp column to history")
             self._conn.execute("ALTER TABLE history ADD COLUMN timestamp REAL")
-            self._conn.execute("UPDATE history SET timestamp = CAST(strftime('%s', t) AS REAL) WHERE timestamp IS NULL")
-            self._conn.execute("UPDATE history SET timestamp = 0 WHERE timestamp IS NULL")
-        
-        # Workers Table Migrations
+            # One pass: rows whose `t` does not parse fall back to 0 instead of needing a second UPDATE
+            self._conn.execute("UPDATE history SET timestamp = COALESCE(CAST(strftime('%s', t) AS REAL), 0) WHERE timestamp IS NULL")
+
         cursor.execute("PRAGMA table_info(workers)")
         w_columns = {info[1] for info in cursor.fetchall()}
         if 'last_seen' not in w_columns:
@@ -96,116 +238,216 @@ class StateManager:
             self._conn.execute("ALTER TABLE workers ADD COLUMN last_seen REAL")
             self._conn.execute("UPDATE workers SET last_seen = ?", (time.time(),))
 
+    def _migrate_v2(self):
+        """v2: Rebuilds history without the TEXT `t` column, with INTEGER timestamps."""
+        # Labels are formatted from `timestamp` on read, so the TEXT copy is dropped
+        # (dropping the table also drops idx_ts, which _create_indexes recreates)
+        self.logger.info("Migrating DB: Rebuilding history without the t column")
+        self._conn.execute(_SQL_CREATE_HISTORY.format(table="history_v2"))
+        self._conn.execute(
+            "INSERT INTO history_v2 (timestamp, v, v_p2pool, v_xvb) "
+            "SELECT CAST(timestamp AS INTEGER), v, COALESCE(v_p2pool, 0), COALESCE(v_xvb, 0) FROM history"
+        )
+        self._conn.execute("DROP TABLE history")
+        self._conn.execute("ALTER TABLE history_v2 RENAME TO history")
+
+    def _migrate_v3(self):
+        """v3: Rebuilds workers as a WITHOUT ROWID table."""
+        # WITHOUT ROWID enforces NOT NULL on the key, so rows without a name are dropped
+        self.logger.info("Migrating DB: Rebuilding workers as a WITHOUT ROWID table")
+        self._conn.execute(_SQL_CREATE_WORKERS.format(table="workers_v3"))
+        self._conn.execute(
+            "INSERT INTO workers_v3 (name, ip, last_seen) "
+            "SELECT name, ip, last_seen FROM workers WHERE name IS NOT NULL"
+        )
+        self._conn.execute("DROP TABLE workers")
+        self._conn.execute("ALTER TABLE workers_v3 RENAME TO workers")
+
+    def _migrate_v4(self):
+        """v4: Moves the state snapshot from kv_store into the snapshots table."""
+        self.logger.info("Migrating DB: Moving the state snapshot into its own table")
+        self._conn.execute(
+            "INSERT OR IGNORE INTO snapshots (name, data) "
+            "SELECT ?, value FROM kv_store WHERE key = 'snapshot_latest_data'",
+            (_SNAPSHOT_NAME,)
+        )
+        self._conn.execute("DELETE FROM kv_store WHERE key = 'snapshot_latest_data'")
+
     def load(self):
         """
         Loads state from SQLite into memory on startup.
+
+        Rows are read into local structures first; the state lock is only taken to install
+        them, so readers never wait on the SQLite scans.
         """
         try:
             with self._db_lock:
                 if not self._conn: return
                 cursor = self._conn.cursor()
-                
-                with self._lock:
-                    # 1. Load History
-                    # Limit to retention period to prevent memory bloat
-                    history_cutoff = time.time() - HISTORY_RETENTION_SEC
-                    cursor.execute("SELECT t, v, v_p2pool, v_xvb, timestamp FROM history WHERE timestamp > ? ORDER BY timestamp ASC", (history_cutoff,))
-                    history = []
-                    for row in cursor.fetchall():
-                        item = dict(row)
-                        # Sanitize NULLs to ensure chart stability
-                        item["v_p2pool"] = item.get("v_p2pool") or 0.0
-                        item["v_xvb"] = item.get("v_xvb") or 0.0
-                        history.append(item)
-                    self.state["hashrate_history"] = deque(history)
-
-                    # 2. Load Workers
-                    # Only load workers seen recently
-                    worker_cutoff = time.time() - WORKER_RETENTION_SEC
-                    cursor.execute("SELECT name, ip, last_seen FROM workers WHERE last_seen > ? OR last_seen IS NULL", (worker_cutoff,))
-                    self.state["known_workers"] = {}
-                    for row in cursor.fetchall():
-                        self.state["known_workers"][row["name"]] = {
-                            "ip": row["ip"],
-                            "last_seen": row["last_seen"] if row["last_seen"] is not None else time.time()
-                        }
-
-                    # 3. Load XVB Stats (KV Store)
-                    cursor.execute("SELECT key, value FROM kv_store WHERE key LIKE 'xvb_%'")
-                    for row in cursor.fetchall():
-                        key = row["key"]
-                        if key.startswith("xvb_"):
-                            key = key[4:]
-                        
-                        val = row["value"]
-                        
-                        # Migration: Handle legacy keys from previous versions
-                        if key == "1h_avg": key = "avg_1h"
-                        if key == "24h_avg": key = "avg_24h"
-
-                        # Enforce schema: Ignore keys not present in the default state
-                        if key not in self.state["xvb"]:
-                            continue
-
-                        try:
-                            # Dynamic type restoration based on default value type
-                            default_val = self.state["xvb"][key]
-                            if isinstance(default_val, bool):
-                                val = val.lower() == "true"
-                            elif isinstance(default_val, float):
-                                val = float(val)
-                            elif isinstance(default_val, int):
-                                val = int(val)
-                            self.state["xvb"][key] = val
-                        except (ValueError, TypeError):
-                            self.logger.warning(f"Skipping corrupted KV pair: {key}={val}")
+
+                # 1. Load History
+                # Limit to retention period to prevent memory bloat
+                history_cutoff = time.time() - HISTORY_RETENTION_SEC
+                # NULLs are coalesced in SQL (for chart stability), so every row fits the float columns as-is
+                cursor.execute(
+                    "SELECT timestamp, COALESCE(v, 0), COALESCE(v_p2pool, 0), COALESCE(v_xvb, 0) "
+                    "FROM history WHERE timestamp > ? ORDER BY timestamp ASC",
+                    (history_cutoff,)
+                )
+                history = _empty_history()
+                columns = [history[name] for name in HISTORY_COLUMNS]
+                # Stream the rows in chunks so the full result set is never materialized
+                # next to the arrays it is copied into; each chunk is transposed and bulk-extended
+                cursor.arraysize = HISTORY_LOAD_CHUNK
+                while True:
+                    rows = cursor.fetchmany()
+                    if not rows:
+                        break
+                    for column, values in zip(columns, zip(*rows)):
+                        column.extend(values)
+
+                # 2. Load Workers
+                # Only load workers seen recently
+                now = time.time()
+                worker_cutoff = now - WORKER_RETENTION_SEC
+                # Ordered by last_seen (NULLs become `now`, so they go last) to seed the dict's expiry order
+                cursor.execute(
+                    "SELECT name, ip, last_seen FROM workers WHERE last_seen > ? OR last_seen IS NULL "
+                    "ORDER BY last_seen IS NULL, last_seen",
+                    (worker_cutoff,)
+                )
+                known_workers = {
+                    name: {"ip": ip, "last_seen": last_seen if last_seen is not None else now}
+                    for name, ip, last_seen in cursor.fetchall()
+                }
+
+                # 3. Load XVB Stats (KV Store)
+                cursor.execute("SELECT key, value FROM kv_store WHERE key LIKE 'xvb_%'")
+                xvb_rows = cursor.fetchall()
+
+            with self._lock:
+                self.state["hashrate_history"] = history
+                self._history_views = {}
+                self.state["known_workers"] = known_workers
+
+                for key, val in xvb_rows:
+                    if key.startswith("xvb_"):
+                        key = key[4:]
                     
-                self.logger.info(f"State successfully loaded from {self.db_path}")
+                    # Migration: Handle legacy keys from previous versions
+                    if key == "1h_avg": key = "avg_1h"
+                    if key == "24h_avg": key = "avg_24h"
+
+                    # Enforce schema: Ignore keys not present in the default state
+                    value_type = self._XVB_TYPES.get(key)
+                    if value_type is None:
+                        continue
+
+                    try:
+                        # Type restoration based on the default value's type
+                        if value_type is bool:
+                            val = val.lower() == "true"
+                        elif value_type is not str:
+                            val = value_type(val)
+                        self.state["xvb"][key] = val
+                    except (ValueError, TypeError):
+                        self.logger.warning(f"Skipping corrupted KV pair: {key}={val}")
+                
+            self.logger.info(f"State successfully loaded from {self.db_path}")
         except sqlite3.Error as e:
             self.logger.error(f"DB Load Error: {e}")
 
-    def update_history(self, hashrate: float, p2pool_hr: float = 0, xvb_hr: float = 0):
-        """Appends a new hashrate data point to the history buffer."""
-        t_str = time.strftime('%Y-%m-%d %H:%M:%S')
-        ts = time.time()
-        
+    def persist_tick(self, hashrate: float, p2pool_hr: float = 0, xvb_hr: float = 0,
+                     snapshot: Union[Dict[str, Any], bytes, None] = None):
+        """
+        Records one collection tick: the hashrate data point and, optionally, the state snapshot.
+
+        When a snapshot is given, the buffered history rows are committed in the same
+        transaction as it, so a snapshot tick costs one commit instead of two.
+        """
+        if self._append_history(hashrate, p2pool_hr, xvb_hr) or snapshot:
+            self.flush_history(snapshot)
+
+    def _append_history(self, hashrate: float, p2pool_hr: float, xvb_hr: float) -> bool:
+        """
+        Adds a data point to the in-memory history and queues it for DB persistence.
+
+        Returns:
+            bool: True once the queued rows should be flushed (batch full or flush interval elapsed).
+        """
+        ts = int(time.time())  # History is kept at whole-second resolution (INTEGER column)
+        cutoff = ts - HISTORY_RETENTION_SEC
+        flush_due = time.monotonic() - self._last_flush >= HISTORY_FLUSH_INTERVAL
+
+        # Values are stored unrounded; rounding to 2 decimals happens when they are rendered
         try:
-            v_val = round(float(hashrate), 2)
-            v_p2p = round(float(p2pool_hr), 2)
-            v_xvb = round(float(xvb_hr), 2)
+            v_val = float(hashrate)
+            v_p2p = float(p2pool_hr)
+            v_xvb = float(xvb_hr)
         except (ValueError, TypeError):
             v_val, v_p2p, v_xvb = 0.0, 0.0, 0.0
 
         with self._lock:
             # 1. Update In-Memory State
-            self.state["hashrate_history"].append({
-                "t": t_str,
-                "v": v_val,
-                "v_p2pool": v_p2p,
-                "v_xvb": v_xvb,
-                "timestamp": ts
-            })
-
-            # Prune in-memory history to enforce retention policy
-            cutoff = ts - HISTORY_RETENTION_SEC
-            while self.state["hashrate_history"] and self.state["hashrate_history"][0]["timestamp"] < cutoff:
-                self.state["hashrate_history"].popleft()
-
-        # 2. Persist to DB
+            self._history_views = {}
+            history = self.state["hashrate_history"]
+            history["timestamp"].append(ts)
+            history["v"].append(v_val)
+            history["v_p2pool"].append(v_p2p)
+            history["v_xvb"].append(v_xvb)
+
+            # Prune in-memory history to enforce retention policy. Timestamps are ascending,
+            # so the expired prefix is found by bisection and dropped with one slice per column
+            expired = bisect_left(history["timestamp"], cutoff)
+            if expired:
+                for column in history.values():
+                    del column[:expired]
+
+            # 2. Queue for DB persistence
+            self._pending_history.append((v_val, v_p2p, v_xvb, ts))
+            return flush_due or len(self._pending_history) >= HISTORY_FLUSH_BATCH
+
+    def flush_history(self, snapshot: Union[Dict[str, Any], bytes, None] = None):
+        """
+        Writes all buffered history rows to the DB in a single transaction.
+
+        Args:
+            snapshot (dict | bytes, optional): State snapshot to commit in the same transaction.
+        """
+        with self._lock:
+            rows, self._pending_history = self._pending_history, []
+            self._last_flush = time.monotonic()
+        if not rows and not snapshot:
+            return
+
         try:
+            payload = None
+            if snapshot:
+                payload = _encode_snapshot(snapshot)
+            pruned = False
             with self._db_lock:
                 if not self._conn:
                     return
-                with self._conn:
-                    self._conn.execute(
-                        "INSERT INTO history (t, v, v_p2pool, v_xvb, timestamp) VALUES (?, ?, ?, ?, ?)",
-                        (t_str, v_val, v_p2p, v_xvb, ts)
-                    )
-                    # Prune old history from DB to prevent unbounded growth (Probabilistic pruning to save I/O)
-                    if random.random() < 0.05:
-                        self._conn.execute("DELETE FROM history WHERE timestamp < ?", (ts - HISTORY_RETENTION_SEC,))
-        except sqlite3.Error as e:
-            self.logger.error(f"History Update Error: {e}")
+                with self._transaction():
+                    if rows:
+                        self._conn.executemany(_SQL_INSERT_HISTORY, rows)
+                        # Prune old history from DB to prevent unbounded growth; retention is measured
+                        # in days, so the DELETE only needs to run every RETENTION_PRUNE_EVERY rows
+                        self._history_rows_since_prune += len(rows)
+                        if self._history_rows_since_prune >= RETENTION_PRUNE_EVERY:
+                            self._conn.execute(
+                                _SQL_PRUNE_HISTORY, (rows[-1][3] - HISTORY_RETENTION_SEC, RETENTION_PRUNE_LIMIT)
+                            )
+                            self._history_rows_since_prune = 0
+                            pruned = True
+                    if payload is not None:
+                        self._conn.execute(_SQL_UPSERT_SNAPSHOT, (_SNAPSHOT_NAME, payload))
+                if pruned:
+                    # Reset the WAL on the prune cadence so it is truncated at a predictable point
+                    # rather than left at its high-water mark between automatic checkpoints
+                    self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except (TypeError, sqlite3.Error) as e:
+            self.logger.error(f"History Flush Error: {e}")
 
     def get_xvb_stats(self) -> Dict[str, Any]:
         """Returns the current XvB mining statistics dictionary."""
@@ -225,36 +467,41 @@ class StateManager:
             fail_count (int, optional): Consecutive failure count for XvB endpoint.
             **kwargs: Updates for other keys in the xvb state (e.g., total_donated_time).
         """
+        ts = time.time()
         updates = {}
         with self._lock:
+            xvb = self.state["xvb"]
+
+            def _set(key, value):
+                # Only changed values are persisted; re-sent identical stats cost no DB write
+                if xvb[key] != value:
+                    xvb[key] = value
+                    updates[f"xvb_{key}"] = value
+
             if mode is not None:
-                self.state["xvb"]["current_mode"] = mode
-                updates["xvb_current_mode"] = mode
+                _set("current_mode", mode)
 
             stats_updated = False
             if avg_24h is not None:
-                self.state["xvb"]["avg_24h"] = avg_24h
-                updates["xvb_avg_24h"] = avg_24h
+                _set("avg_24h", avg_24h)
                 stats_updated = True
                 
             if avg_1h is not None:
-                self.state["xvb"]["avg_1h"] = avg_1h
-                updates["xvb_avg_1h"] = avg_1h
+                _set("avg_1h", avg_1h)
                 stats_updated = True
             if fail_count is not None:
-                self.state["xvb"]["fail_count"] = fail_count
-                updates["xvb_fail_count"] = fail_count
+                _set("fail_count", fail_count)
                 stats_updated = True
             
             # Handle additional fields passed via kwargs (e.g., total_donated_time)
             for k, v in kwargs.items():
-                if k in self.state["xvb"] and k != "current_mode":
+                if k in xvb and k != "current_mode":
                     # Skip None values to prevent type corruption in DB (persisted as "None" string)
                     if v is None:
                         continue
 
                     # Enforce type consistency with initialized state to prevent runtime drift
-                    default_val = self.state["xvb"][k]
+                    default_val = xvb[k]
                     try:
                         if isinstance(default_val, float):
                             v = float(v)
@@ -263,15 +510,15 @@ class StateManager:
                     except (ValueError, TypeError):
                         pass  # Keep original value if cast fails
 
-                    self.state["xvb"][k] = v
-                    updates[f"xvb_{k}"] = v
+                    _set(k, v)
                     stats_updated = True
                 
-            # Update timestamp only if statistical data changed
+            # Refresh the sync timestamp whenever stats arrived; it is only persisted
+            # alongside a changed value, so an unchanged sync skips the DB entirely
             if stats_updated:
-                ts = time.time()
-                self.state["xvb"]["last_update"] = ts
-                updates["xvb_last_update"] = ts
+                xvb["last_update"] = ts
+                if updates:
+                    updates["xvb_last_update"] = ts
             
         # Persist to DB
         if updates:
@@ -279,12 +526,41 @@ class StateManager:
                 with self._db_lock:
                     if not self._conn:
                         return
-                    with self._conn:
-                        self._conn.executemany("INSERT OR REPLACE INTO kv_store (key, value) VALUES (?, ?)", 
-                                         [(k, str(v)) for k, v in updates.items()])
+                    with self._transaction():
+                        self._conn.executemany(_SQL_UPSERT_KV, [(k, str(v)) for k, v in updates.items()])
             except sqlite3.Error as e:
                 self.logger.error(f"XVB Update Error: {e}")
 
+    def transition(self, mode_label: str) -> str:
+        """
+        Records a mining mode transition with a single lock acquisition and a single-row persist.
+
+        Unlike `update_xvb_stats`, this touches only `current_mode` and leaves `last_update`
+        untouched, since a mode switch carries no new statistical data. Re-recording the
+        active label is a no-op, so callers need not read the current mode first.
+
+        Args:
+            mode_label (str): The new mode label (e.g., "P2POOL", "XVB (Split)").
+
+        Returns:
+            str: The previously active mode label.
+        """
+        with self._lock:
+            previous = self.state["xvb"]["current_mode"]
+            if previous == mode_label:
+                return previous
+            self.state["xvb"]["current_mode"] = mode_label
+
+        try:
+            with self._db_lock:
+                if not self._conn:
+                    return previous
+                with self._transaction():
+                    self._conn.execute(_SQL_UPSERT_KV, ("xvb_current_mode", mode_label))
+        except sqlite3.Error as e:
+            self.logger.error(f"Mode Transition Error: {e}")
+        return previous
+
     def update_known_workers(self, workers_list: List[Dict[str, str]]):
         """
         Updates the list of known workers.
@@ -295,49 +571,63 @@ class StateManager:
         if workers_list is None:
             workers_list = []
         ts = time.time()
+        cutoff = ts - WORKER_RETENTION_SEC
         to_upsert = []
         
         with self._lock:
+            known_workers = self.state["known_workers"]
             for w in workers_list:
                 name = w.get('name')
                 ip = w.get('ip')
                 if name and ip:
-                    # Update memory
-                    self.state["known_workers"][name] = {"ip": ip, "last_seen": ts}
+                    # Update memory; re-inserting moves the worker to the end, keeping the
+                    # dict ordered by last_seen (oldest first)
+                    known_workers.pop(name, None)
+                    known_workers[name] = {"ip": ip, "last_seen": ts}
                     
                     # Always update DB timestamp for active workers
                     to_upsert.append((name, ip, ts))
             
-            # Prune old workers from memory
-            cutoff = ts - WORKER_RETENTION_SEC
-            to_remove = [k for k, v in self.state["known_workers"].items() if v["last_seen"] < cutoff]
+            # Prune old workers from memory: expired entries form a prefix of the dict,
+            # so the scan stops at the first worker that is still within retention
+            to_remove = []
+            for k, v in known_workers.items():
+                if v["last_seen"] >= cutoff:
+                    break
+                to_remove.append(k)
             for k in to_remove:
-                del self.state["known_workers"][k]
+                del known_workers[k]
         
         if to_upsert:
             try:
                 with self._db_lock:
                     if not self._conn:
                         return
-                    with self._conn:
-                        self._conn.executemany("INSERT OR REPLACE INTO workers (name, ip, last_seen) VALUES (?, ?, ?)", to_upsert)
-                        # Prune old workers from DB
-                        self._conn.execute("DELETE FROM workers WHERE last_seen < ?", (ts - WORKER_RETENTION_SEC,))
+                    with self._transaction():
+                        self._conn.executemany(_SQL_UPSERT_WORKER, to_upsert)
+                        # Prune old workers from DB (amortized like the history retention DELETE)
+                        self._worker_updates_since_prune += 1
+                        if self._worker_updates_since_prune >= RETENTION_PRUNE_EVERY:
+                            self._conn.execute(_SQL_PRUNE_WORKERS, (cutoff,))
+                            self._worker_updates_since_prune = 0
             except sqlite3.Error as e:
                 self.logger.error(f"Worker Update Error: {e}")
 
-    def save_snapshot(self, data: Dict[str, Any]):
-        """Persists the full application state snapshot to the KV store."""
+    def save_snapshot(self, data: Union[Dict[str, Any], bytes]):
+        """
+        Persists the full application state snapshot to the snapshots table.
+
+        Accepts either the state dict or its pre-encoded JSON bytes; both are stored zlib-compressed.
+        """
         if not data:
             return
         try:
-            json_str = json.dumps(data)
+            payload = _encode_snapshot(data)
             with self._db_lock:
                 if not self._conn:
                     return
-                with self._conn:
-                    self._conn.execute("INSERT OR REPLACE INTO kv_store (key, value) VALUES (?, ?)", 
-                                     ("snapshot_latest_data", json_str))
+                with self._transaction():
+                    self._conn.execute(_SQL_UPSERT_SNAPSHOT, (_SNAPSHOT_NAME, payload))
         except (TypeError, sqlite3.Error) as e:
             self.logger.error(f"Snapshot Save Error: {e}")
 
@@ -348,11 +638,11 @@ class StateManager:
                 if not self._conn:
                     return None
                 cursor = self._conn.cursor()
-                cursor.execute("SELECT value FROM kv_store WHERE key = 'snapshot_latest_data'")
+                cursor.execute("SELECT data FROM snapshots WHERE name = ?", (_SNAPSHOT_NAME,))
                 row = cursor.fetchone()
                 if row and row[0]:
-                    return json.loads(row[0])
-        except (json.JSONDecodeError, sqlite3.Error) as e:
+                    return _decode_snapshot(row[0])
+        except (json.JSONDecodeError, zlib.error, sqlite3.Error) as e:
             self.logger.error(f"Snapshot Load Error: {e}")
         return None
 
@@ -361,10 +651,26 @@ class StateManager:
         with self._lock:
             return [{"name": k, "ip": v["ip"]} for k, v in self.state["known_workers"].items()]
 
-    def get_history(self) -> List[Dict[str, Any]]:
-        """Returns a copy of the hashrate history."""
+    def get_history_columns(self, since: float = 0) -> Dict[str, Any]:
+        """
+        Returns a copy of the hashrate history columns, restricted to points at or after `since`.
+
+        The copy is shared by every caller asking for the same range until the next history
+        update, so callers must treat the returned arrays as read-only.
+
+        Args:
+            since (float): Unix timestamp of the oldest point to include (0 for all).
+
+        Returns:
+            dict: Column name (see HISTORY_COLUMNS) -> array of values.
+        """
         with self._lock:
-            return list(self.state["hashrate_history"])
+            history = self.state["hashrate_history"]
+            start = bisect_left(history["timestamp"], since) if since else 0
+            view = self._history_views.get(start)
+            if view is None:
+                view = self._history_views[start] = {name: column[start:] for name, column in history.items()}
+            return view
 
     def get_tiers(self) -> Dict[str, Any]:
         """Returns a copy of the donation tiers configuration."""
@@ -372,9 +678,16 @@ class StateManager:
             return self.state["tiers"].copy()
 
     def close(self):
-        """Closes the database connection safely."""
+        """Flushes buffered history, checkpoints the WAL and closes the database connection safely."""
+        atexit.unregister(self.close)
+        self.flush_history()
         with self._db_lock:
             if self._conn:
+                try:
+                    # Fold the WAL back into the main file so the next start has nothing to replay
+                    self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+                except sqlite3.Error as e:
+                    self.logger.warning(f"WAL checkpoint failed: {e}")
                 try:
                     self._conn.close()
                     self.logger.info("Database connection closed.")
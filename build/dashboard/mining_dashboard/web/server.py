@@ -3,7 +3,6 @@ import time
 import html
 import logging
 import bisect
-import json
 from aiohttp import web
 from config.config import HOST_IP, BLOCK_PPLNS_WINDOW_MAIN, ENABLE_XVB
 from helper.utils import format_hashrate, format_duration, format_time_abs, get_tier_info
@@ -35,46 +34,53 @@ def get_cached_template():
         logger.error(f"Error loading template: {e}")
     return _TEMPLATE_CACHE or "<h1>Template Error</h1>"
 
-def _get_chart_context(history, shares, range_arg):
-    """Filters historical data based on the selected time range and prepares Chart.js datasets."""
-    filtered_history = history
+# Seconds covered by each chart range selector (anything else shows the full history)
+CHART_RANGE_SECONDS = {'1h': 3600, '24h': 86400, '1w': 604800, '1m': 2592000}
+
+def _chart_cutoff(range_arg):
+    """Returns the Unix timestamp where the selected chart range starts (0 for 'all')."""
+    target_seconds = CHART_RANGE_SECONDS.get(range_arg, 0)
+    return time.time() - target_seconds if target_seconds else 0
+
+def _get_range_classes(range_arg):
+    """Marks the chart range selector button matching the selected range as active."""
+    return {f'cls_{key}': 'active' if range_arg == key else '' for key in CHART_RANGE_SECONDS}
+
+def _get_chart_context(history, shares, cutoff_timestamp=0):
+    """
+    Prepares Chart.js datasets from the history columns and the shares of the selected range.
+
+    `history` is the column dict from `StateManager.get_history_columns`, already restricted
+    to `cutoff_timestamp`; shares older than the cutoff are dropped here.
+    """
     filtered_shares = shares
-    
-    if range_arg != 'all':
-        target_seconds = 0
-        if range_arg == '1h': target_seconds = 3600
-        elif range_arg == '24h': target_seconds = 86400
-        elif range_arg == '1w': target_seconds = 604800
-        elif range_arg == '1m': target_seconds = 2592000 
-        
-        if target_seconds > 0:
-            cutoff_timestamp = time.time() - target_seconds
-            filtered_history = [x for x in history if x['timestamp'] >= cutoff_timestamp]
-            filtered_shares = [x for x in shares if x['ts'] >= cutoff_timestamp]
+    if cutoff_timestamp:
+        filtered_shares = [x for x in shares if x['ts'] >= cutoff_timestamp]
+
+    hist_ts = history['timestamp']
+    hist_v = history['v']
 
     p2pool_data = []
     xvb_data = []
-    chart_labels_list = [json.dumps(x['t']) for x in filtered_history]
+    # Labels are derived from the timestamps here; the format has no characters that need
+    # JSON escaping, so the quotes are emitted by strftime itself
+    strftime, localtime = time.strftime, time.localtime
+    chart_labels_list = [strftime('"%Y-%m-%d %H:%M:%S"', localtime(ts)) for ts in hist_ts]
 
-    for x in filtered_history:
-        v = x.get('v', 0)
-        vp = x.get('v_p2pool', 0)
-        vx = x.get('v_xvb', 0)
-        
+    for v, vp, vx in zip(hist_v, history['v_p2pool'], history['v_xvb']):
         # Fallback for legacy data: if breakdown is missing, assume P2Pool
         if vp == 0 and vx == 0 and v > 0:
             vp = v
             
-        p2pool_data.append(str(vp))
-        xvb_data.append(str(vx))
+        p2pool_data.append(f"{vp:.2f}")
+        xvb_data.append(f"{vx:.2f}")
 
     # --- CHANGED: Use parallel arrays instead of objects ---
-    share_y_list = ['null'] * len(filtered_history)
-    share_r_list = ['0'] * len(filtered_history)
-    share_c_list = ['0'] * len(filtered_history)
+    share_y_list = ['null'] * len(hist_ts)
+    share_r_list = ['0'] * len(hist_ts)
+    share_c_list = ['0'] * len(hist_ts)
     
-    if filtered_history and filtered_shares:
-        hist_ts = [x['timestamp'] for x in filtered_history]
+    if hist_ts and filtered_shares:
         share_counts = {}
 
         for s in filtered_shares:
@@ -89,9 +95,8 @@ def _get_chart_context(history, shares, range_arg):
                 share_counts[closest_idx] = share_counts.get(closest_idx, 0) + 1
 
         for idx, count in share_counts.items():
-            if idx < len(filtered_history):
-                item = filtered_history[idx]
-                v = item.get('v', 0)
+            if idx < len(hist_ts):
+                v = hist_v[idx]
                 
                 # 1. Calculate offset: Lift the triangle 10% above the line value
                 # If v is 0 (rare), default to a small number so it doesn't disappear
@@ -100,23 +105,19 @@ def _get_chart_context(history, shares, range_arg):
                 r = min(6 + (count * 3), 15)
                 
                 # 2. Use the OFFSET position (y_pos) instead of the exact line value (v)
-                share_y_list[idx] = str(y_pos)
+                share_y_list[idx] = f"{y_pos:.2f}"
                 share_r_list[idx] = str(r)
                 share_c_list[idx] = str(count)
 
     return {
         'chart_labels': ",".join(chart_labels_list),
-        'chart_data': ",".join([str(x['v']) for x in filtered_history]),
+        'chart_data': ",".join([f"{v:.2f}" for v in hist_v]),
         'chart_p2pool': ",".join(p2pool_data),
         'chart_xvb': ",".join(xvb_data),
         # Pass the 3 separate lists
         'chart_shares_y': ",".join(share_y_list),
         'chart_shares_r': ",".join(share_r_list),
-        'chart_shares_c': ",".join(share_c_list),
-        'cls_1h': 'active' if range_arg == '1h' else '',
-        'cls_24h': 'active' if range_arg == '24h' else '',
-        'cls_1w': 'active' if range_arg == '1w' else '',
-        'cls_1m': 'active' if range_arg == '1m' else ''
+        'chart_shares_c': ",".join(share_c_list)
     }
 
 def _get_worker_rows(workers):
@@ -169,7 +170,7 @@ def _get_worker_rows(workers):
 
 def _get_tari_context(data):
     """Extracts and formats Tari merge mining metrics for the dashboard."""
-    tari_stats = data.get('tari', {})
+    tari_stats = data.tari
     tari_active = tari_stats.get('active', False)
     t_addr = tari_stats.get('address', 'Unknown')
     t_short = t_addr if len(t_addr) <= 16 else f"{t_addr[:8]}...{t_addr[-8:]}"
@@ -190,7 +191,7 @@ def _get_tari_context(data):
 
 def _get_system_context(data):
     """Extracts and formats system resource metrics (CPU, RAM, Disk, HugePages)."""
-    system = data.get('system', {})
+    system = data.system
     
     # Disk Usage
     disk_usage = system.get('disk', {})
@@ -263,11 +264,11 @@ def _get_system_context(data):
 
 def _get_pool_network_context(data):
     """Extracts and formats P2Pool, Stratum, and Monero Network metrics."""
-    pool_stats = data.get('pool', {})
+    pool_stats = data.pool
     p2p_stats = pool_stats.get('p2p', {})
     local_pool = pool_stats.get('pool', {})
-    stratum_stats = data.get('stratum', {})
-    network_stats = data.get('network', {})
+    stratum_stats = data.stratum
+    network_stats = data.network
 
     net_hash_val = str(network_stats.get('hash', 'N/A'))
     if len(net_hash_val) > 20:
@@ -276,19 +277,15 @@ def _get_pool_network_context(data):
     s_addr = stratum_stats.get('wallet', 'Unknown')
     s_short = s_addr if len(s_addr) <= 16 else f"{s_addr[:8]}...{s_addr[-8:]}"
 
-    workers_list = data.get('workers', [])
+    workers_list = data.workers
     proxy_count = sum(1 for w in workers_list if w.get('status') == 'online')
 
     # Determine block time based on pool type (Main/Mini=10s, Nano=30s)
     pool_type = p2p_stats.get('type', 'Main')
     block_time = 30 if pool_type == 'Nano' else 10
 
-    # Calculate shares in window
-    shares_list = data.get('shares', [])
-    pplns_window = local_pool.get('pplns_window', 2160)
-    window_duration = pplns_window * block_time
-    cutoff = time.time() - window_duration
-    shares_count = sum(1 for s in shares_list if s.get('ts', 0) >= cutoff)
+    # Shares in the PPLNS window (counted by the data service each tick)
+    shares_count = data.shares_in_window
     shares_display = f"<span class='status-ok'>{shares_count}</span>" if shares_count > 0 else f"<span class='status-bad'>0</span>"
 
     return {
@@ -353,11 +350,11 @@ def _get_algo_context(data, state_mgr, history):
         p2p_color = c_green
         xvb_color = c_muted
 
-    total_hr_val = data.get('total_live_h15', 0)
+    total_hr_val = data.total_live_h15
     xvb_1h_val = xvb_stats.get('avg_1h', 0)
     xvb_24h_val = xvb_stats.get('avg_24h', 0)
 
-    stratum_stats = data.get('stratum', {})
+    stratum_stats = data.stratum
     p2p_1h_val = stratum_stats.get('hashrate_1h', 0)
     p2p_24h_val = stratum_stats.get('hashrate_24h', 0)
 
@@ -393,20 +390,22 @@ async def handle_index(request):
     Handles view modes (Sync vs. Dashboard) and time-range filtering.
     """
     app = request.app
-    data = app['latest_data']
+    # Grab the current immutable snapshot once so every section renders consistent data
+    data = app['data_service'].latest_data
     state_mgr = app['state_manager']
     
     try:
-        history = state_mgr.get_history()
-        shares = data.get('shares', [])
+        shares = data.shares
         range_arg = request.query.get('range', 'all')
+        chart_cutoff = _chart_cutoff(range_arg)
+        history = state_mgr.get_history_columns(chart_cutoff)
         
         # Prepare Sync Context
-        monero_sync = data.get('monero_sync', {})
-        tari_sync = data.get('tari_sync', {})
+        monero_sync = data.monero_sync
+        tari_sync = data.tari_sync
         
         # Use global_sync flag from DataService to trigger dashboard sync mode
-        is_syncing = data.get('global_sync', False)
+        is_syncing = data.global_sync
         
         # Format Monero Sync Display (Checkmark if 100%)
         m_pct = monero_sync.get('percent', 0)
@@ -438,14 +437,15 @@ async def handle_index(request):
         }
 
         # Build Contexts
-        chart_ctx = _get_chart_context(history, shares, range_arg)
+        chart_ctx = _get_chart_context(history, shares, chart_cutoff)
+        range_ctx = _get_range_classes(range_arg)
         system_ctx = _get_system_context(data)
         pool_net_ctx = _get_pool_network_context(data)
         algo_ctx = _get_algo_context(data, state_mgr, history)
         tari_ctx = _get_tari_context(data)
         
         # Dynamic Components
-        worker_rows = _get_worker_rows(data.get('workers', []))
+        worker_rows = _get_worker_rows(data.workers)
 
         # Dynamic Header Badges
         if is_syncing:
@@ -468,7 +468,8 @@ async def handle_index(request):
             **system_ctx,
             **pool_net_ctx,
             **tari_ctx,
-            **chart_ctx
+            **chart_ctx,
+            **range_ctx
         )
 
         return web.Response(text=response_html, content_type='text/html')
@@ -477,12 +478,12 @@ async def handle_index(request):
         # Handle rendering errors gracefully
         return web.Response(text=f"<h1>Error rendering dashboard</h1><p>{str(e)}</p><pre>{type(e).__name__}</pre>", status=500)
 
-def create_app(state_manager, latest_data_ref):
+def create_app(state_manager, data_service):
     """Factory to create the web app instance."""
     app = web.Application()
     # Pass shared state objects to the app context
     app['state_manager'] = state_manager
-    app['latest_data'] = latest_data_ref
+    app['data_service'] = data_service
     
     app.add_routes([web.get('/', handle_index)])
     